@@ -0,0 +1,64 @@
+import mmap
+import os
+import threading
+
+
+class MmapAppendLog:
+    """
+    Append-only file written through a shared memory mapping, so appending a line is a
+    memcpy rather than a write() syscall; the kernel writes dirty pages back on its own.
+    The file is grown chunk_bytes at a time and trimmed to the bytes actually written on
+    close(). If the process dies before close(), the file ends in zero padding, so readers
+    should skip NUL bytes; reopening the file trims that padding before appending.
+    """
+    _SCAN_BLOCK = 1 << 20
+
+    def __init__(self, path: str, chunk_bytes: int):
+        # O_BINARY: on Windows a text-mode fd would translate CRLF and stop at 0x1A in os.read(),
+        # breaking _end_of_data()'s offset arithmetic
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._chunk_bytes = chunk_bytes
+        self._offset = self._end_of_data() # Append after the lines already in the file
+        os.ftruncate(self._fd, self._offset) # Drop the padding so the extension below is all fresh zeros
+        self._size = self._offset + chunk_bytes
+        os.ftruncate(self._fd, self._size)
+        self._mm = mmap.mmap(self._fd, self._size)
+        self._remap_lock = threading.Lock() # flush() may run in another thread; never remap under it
+
+    def _end_of_data(self) -> int:
+        """
+        Returns the offset just past the last complete line, scanning back over the zero
+        padding (and any torn final line) a crashed writer leaves behind.
+        """
+        end = os.fstat(self._fd).st_size
+        while end > 0:
+            start = max(0, end - self._SCAN_BLOCK)
+            os.lseek(self._fd, start, os.SEEK_SET) # No os.pread on Windows
+            block = os.read(self._fd, end - start).rstrip(b"\0")
+            if block:
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    return start + newline + 1
+                # No newline yet: this block is all (part of) one torn line, keep looking
+            end = start
+        return 0
+
+    def write(self, data: bytes):
+        end = self._offset + len(data)
+        if end > self._size:
+            self._size = max(end, self._size + self._chunk_bytes)
+            with self._remap_lock:
+                self._mm.resize(self._size) # Also extends the underlying file
+        self._mm[self._offset:end] = data
+        self._offset = end
+
+    def flush(self):
+        """Synchronously writes dirty pages back to the file (msync). Safe to call from another thread."""
+        with self._remap_lock:
+            self._mm.flush()
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+        os.ftruncate(self._fd, self._offset)
+        os.close(self._fd)
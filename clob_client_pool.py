@@ -0,0 +1,91 @@
+import base64
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import types
+from pathlib import Path
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError: # Without cryptography the creds are derived every run instead of cached
+    Fernet = None
+from py_clob_client.client import ClobClient
+from py_clob_client.clob_types import ApiCreds
+from dotenv import dotenv_values
+
+CLOB_HOST = "https://clob.polymarket.com"
+CHAIN_ID = 137
+
+# Derived CLOB API creds, encrypted with a key derived from the wallet private key, so a restart
+# doesn't need the creds round-trip to the CLOB server
+CREDS_CACHE_PATH = Path.home() / ".arb" / "clob_creds.enc"
+
+@functools.lru_cache(maxsize=1)
+def _cfg():
+    """Wallet settings from .env, read once per process; real environment variables take precedence."""
+    values = {**dotenv_values(), **os.environ}
+    return types.SimpleNamespace(
+        private_key=values.get("WALLET_PRIVATE_KEY"),
+        proxy_address=values.get("POLYMARKET_PROXY_ADDRESS"),
+    )
+
+def _creds_fernet(private_key):
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(private_key.encode()).digest()))
+
+def get_or_create_creds(client, private_key):
+    """
+    Returns the API creds for client's wallet from CREDS_CACHE_PATH, or derives them with
+    create_or_derive_api_creds() and caches them if the file is missing or can't be decrypted
+    (e.g. it was written for a different wallet). Without cryptography installed nothing is cached.
+    """
+    if Fernet is None:
+        return client.create_or_derive_api_creds()
+    fernet = _creds_fernet(private_key)
+    try:
+        return ApiCreds(**json.loads(fernet.decrypt(CREDS_CACHE_PATH.read_bytes())))
+    except (OSError, InvalidToken, ValueError, TypeError):
+        pass
+    creds = client.create_or_derive_api_creds()
+    try:
+        CREDS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CREDS_CACHE_PATH.write_bytes(fernet.encrypt(json.dumps(dataclasses.asdict(creds)).encode()))
+    except OSError:
+        pass # Caching is best effort; the creds are still good
+    return creds
+
+def invalidate_cached_creds():
+    """Deletes CREDS_CACHE_PATH, so the next get_or_create_creds() derives fresh creds."""
+    try:
+        CREDS_CACHE_PATH.unlink()
+    except FileNotFoundError:
+        pass
+
+def refresh_creds(client, private_key=None):
+    """
+    Called when the CLOB rejects client's creds (HTTP 401), e.g. because the cached ones were
+    revoked: drops the cache, derives and caches new creds, and sets them on client.
+    private_key defaults to WALLET_PRIVATE_KEY from .env.
+    """
+    invalidate_cached_creds()
+    creds = get_or_create_creds(client, private_key or _cfg().private_key)
+    client.set_api_creds(creds)
+    return creds
+
+@functools.lru_cache(maxsize=1)
+def get_clob_client():
+    """
+    Returns the process-wide ClobClient, building it (and deriving its API creds) on first use.
+    Later callers reuse the same client and its HTTP session instead of paying the TLS
+    handshake and creds round-trip again.
+    """
+    cfg = _cfg()
+    client = ClobClient(
+        CLOB_HOST,
+        key=cfg.private_key,
+        chain_id=CHAIN_ID,
+        signature_type=1,
+        funder=cfg.proxy_address,
+    )
+    client.set_api_creds(get_or_create_creds(client, cfg.private_key))
+    return client
@@ -1,23 +1,98 @@
 import asyncio
+import dataclasses
 import logging
-import pprint
-from typing import Dict, Any, Optional, Tuple
+import os
+from typing import Dict, Any, Optional, Tuple, Set
 import time
-from datetime import datetime, timezone
+from datetime import datetime
 import json
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib encoder if orjson isn't installed
+    orjson = None
 # Import your classes and functions
 
 from order_book import OrderBook
 from polymarket.updates import update_polymarket_order_book
 from kalshi.updates import update_kalshi_order_book
+from polymarket.wss import SOURCE_POLYMARKET
+from kalshi.clients import SOURCE_KALSHI
 from config import PRINT_INTERVAL_SECONDS, MARKET_MAPPING, OUTPUT_FILE_NAME, JSON_OUTPUT_FILE_NAME
 
+@dataclasses.dataclass(slots=True)
+class MarketCmp:
+    """Cross-platform best prices for one canonical market's 'Yes' outcome."""
+    buy_platform: Optional[str] = None
+    buy_price: float = float('inf')
+    sell_platform: Optional[str] = None
+    sell_price: float = 0.0
+    arb_liquidity: float = 0.0
+
 ALL_ORDER_BOOKS={}
 REVERSE_MARKET_LOOKUP={}
-MARKET_COMPARISON_DATA={}
+MARKET_COMPARISON_DATA: Dict[str, MarketCmp] = {}
+PAIRED_BOOKS: Dict[str, Tuple[Optional[OrderBook], Optional[OrderBook]]] = {} # canonical_name -> (poly_book, kalshi_book)
+
+def _dumps_line(obj: Any) -> bytes:
+    """Serializes obj to a newline-terminated JSON line as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + "\n").encode()
+
+# Markets whose comparison may have changed since the last comparison_flusher_task() pass
+# (top of book moved, or any level changed while an arbitrage is open), or that are due a snapshot
+DIRTY_MARKETS: Set[str] = set()
+COMPARISON_FLUSH_SECONDS = 0.01
+
+# Tasks started by start_background_tasks(); stop_background_tasks() cancels them
+_BACKGROUND_TASKS: list = []
+
+# JSONL log lines (bytes) are queued here and written by json_writer_task()
+JSON_LOG_QUEUE: asyncio.Queue = asyncio.Queue()
+JSON_LOG_BATCH_SIZE = 64 # Flush once this many lines are pending...
+JSON_LOG_FLUSH_SECONDS = 0.05 # ...or after this long without a new line
+_IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
+# Delta logging state: only comparison changes are logged, with periodic full snapshots
+SNAPSHOT_EVERY_N_DELTAS = 1000
+SNAPSHOT_EVERY_SECONDS = 10.0
+_SNAPSHOT_EVERY_NS = int(SNAPSHOT_EVERY_SECONDS * 1_000_000_000)
+_LOG_SEQ = 0
+_DELTAS_SINCE_SNAPSHOT: Dict[str, int] = {}
+_LAST_SNAPSHOT_TIME: Dict[str, int] = {} # canonical_name -> time.time_ns() of the last snapshot
+# canonical_name -> (delta entry, snapshot entry); built once in initialize_market_data()
+# and mutated in place before each serialization
+LOG_TEMPLATE: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+class CachedFormatter(logging.Formatter):
+    """
+    Formatter that formats the seconds part of %(asctime)s once per second
+    instead of calling time.strftime for every record.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = -1
+        self._cached_time = ""
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time = time.strftime(self.default_time_format, self.converter(second))
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
+def configure_logging():
+    """
+    Installs a CachedFormatter root handler. Meant for a script's __main__ block, not import
+    time: force=True replaces whatever root handlers are already installed (polymarket.wss
+    sets one up on import), which an importing module shouldn't have done to it.
+    """
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(CachedFormatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logging.basicConfig(level=logging.INFO, handlers=[log_handler], force=True)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
@@ -39,126 +114,93 @@ async def initialize_market_data():
             REVERSE_MARKET_LOOKUP[kalshi_id] = canonical_name
             logger.info(f"  Added Kalshi book for {kalshi_id}")
 
-        MARKET_COMPARISON_DATA[canonical_name] = {
-            'cheapest_buy_yes': {'platform': None, 'price': float('inf')},
-            'highest_sell_yes': {'platform': None, 'price': 0.0}
-        }
+        MARKET_COMPARISON_DATA[canonical_name] = MarketCmp()
+        PAIRED_BOOKS[canonical_name] = (
+            ALL_ORDER_BOOKS.get(market_ids.get("polymarket")),
+            ALL_ORDER_BOOKS.get(market_ids.get("kalshi")),
+        )
+        LOG_TEMPLATE[canonical_name] = _new_log_templates(canonical_name)
     logger.info("All market data structures initialized.")
+    start_background_tasks()
+
+def start_background_tasks():
+    """
+    Starts the tasks that consume what process_websocket_message() produces; without them
+    nothing is compared or logged, and DIRTY_MARKETS and JSON_LOG_QUEUE only grow.
+    Called by initialize_market_data().
+    """
+    if _BACKGROUND_TASKS:
+        return
+    _BACKGROUND_TASKS.append(asyncio.create_task(comparison_flusher_task()))
+    _BACKGROUND_TASKS.append(asyncio.create_task(json_writer_task()))
+
+async def stop_background_tasks():
+    """Cancels the start_background_tasks() tasks and waits for them to finish."""
+    for task in _BACKGROUND_TASKS:
+        task.cancel()
+    await asyncio.gather(*_BACKGROUND_TASKS, return_exceptions=True)
+    _BACKGROUND_TASKS.clear()
 
 def get_paired_books(canonical_name: str) -> Tuple[Optional[OrderBook], Optional[OrderBook]]:
     """
     Retrieves the Polymarket and Kalshi OrderBook instances for a given canonical market name.
+    The pairs are resolved once in initialize_market_data().
     """
-    poly_book = None
-    kalshi_book = None
-    market_ids = MARKET_MAPPING.get(canonical_name)
-    if market_ids:
-        if "polymarket" in market_ids:
-            poly_book = ALL_ORDER_BOOKS.get(market_ids["polymarket"])
-        if "kalshi" in market_ids:
-            kalshi_book = ALL_ORDER_BOOKS.get(market_ids["kalshi"])
-    return poly_book, kalshi_book
+    return PAIRED_BOOKS.get(canonical_name, (None, None))
 
-def perform_cross_market_comparison(canonical_name: str):
+def perform_cross_market_comparison(canonical_name: str, _inf=float('inf')):
     """
     Compares prices for a given canonical market across Polymarket and Kalshi
-    and updates MARKET_COMPARISON_DATA.
+    and updates its MarketCmp in MARKET_COMPARISON_DATA.
     Also calculates and prints liquidity for arbitrage opportunities.
+    The market's state is only written to the JSON log if the comparison changed
+    or its periodic snapshot is due.
     """
     poly_book, kalshi_book = get_paired_books(canonical_name)
 
-    current_comparison = MARKET_COMPARISON_DATA[canonical_name]
-
-    cheapest_buy_price = float('inf')
-    cheapest_buy_platform = None
-    cheapest_buy_book: Optional[OrderBook] = None # New: store the actual book
-    
-    highest_sell_price = 0.0
-    highest_sell_platform = None
-    highest_sell_book: Optional[OrderBook] = None # New: store the actual book
-
-    # Compare for cheapest buy (lowest ask)
-    if poly_book and poly_book.lowest_ask is not None:
-        if poly_book.lowest_ask < cheapest_buy_price:
-            cheapest_buy_price = poly_book.lowest_ask
-            cheapest_buy_platform = "Polymarket"
-            cheapest_buy_book = poly_book
-        elif poly_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform is None:
-            cheapest_buy_platform = "Polymarket"
-            cheapest_buy_book = poly_book
-
-    if kalshi_book and kalshi_book.lowest_ask is not None:
-        if kalshi_book.lowest_ask < cheapest_buy_price:
-            cheapest_buy_price = kalshi_book.lowest_ask
-            cheapest_buy_platform = "Kalshi"
-            cheapest_buy_book = kalshi_book
-        elif kalshi_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform == "Polymarket":
-            pass # Keep Polymarket if already set and price is equal
-        elif kalshi_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform is None:
-            cheapest_buy_platform = "Kalshi"
-            cheapest_buy_book = kalshi_book
-
-    # Compare for highest sell (highest bid)
-    if poly_book and poly_book.highest_bid is not None:
-        if poly_book.highest_bid > highest_sell_price:
-            highest_sell_price = poly_book.highest_bid
-            highest_sell_platform = "Polymarket"
-            highest_sell_book = poly_book
-        elif poly_book.highest_bid == highest_sell_price and highest_sell_platform is None:
-            highest_sell_platform = "Polymarket"
-            highest_sell_book = poly_book
-    
-    if kalshi_book and kalshi_book.highest_bid is not None:
-        if kalshi_book.highest_bid > highest_sell_price:
-            highest_sell_price = kalshi_book.highest_bid
-            highest_sell_platform = "Kalshi"
-            highest_sell_book = kalshi_book
-        elif kalshi_book.highest_bid == highest_sell_price and highest_sell_platform == "Polymarket":
-            pass # Keep Polymarket if already set and price is equal
-        elif kalshi_book.highest_bid == highest_sell_price and highest_sell_platform is None:
-            highest_sell_platform = "Kalshi"
-            highest_sell_book = kalshi_book
+    cmp = MARKET_COMPARISON_DATA[canonical_name]
+
+    books = (("Polymarket", poly_book), ("Kalshi", kalshi_book))
+
+    # Cheapest buy (lowest ask) and highest sell (highest bid) across platforms.
+    # min/max keep the first of equal prices, so Polymarket wins ties.
+    ask_candidates = [(book.lowest_ask, platform, book) for platform, book in books
+                      if book and book.lowest_ask is not None]
+    bid_candidates = [(book.highest_bid, platform, book) for platform, book in books
+                      if book and book.highest_bid is not None]
+
+    cheapest_buy_price, cheapest_buy_platform, cheapest_buy_book = \
+        min(ask_candidates, key=lambda c: c[0]) if ask_candidates else (_inf, None, None)
+    highest_sell_price, highest_sell_platform, highest_sell_book = \
+        max(bid_candidates, key=lambda c: c[0]) if bid_candidates else (0.0, None, None)
+
+    previous_state = (cmp.buy_platform, cmp.buy_price, cmp.sell_platform, cmp.sell_price, cmp.arb_liquidity)
 
     # Update global comparison data
-    if cheapest_buy_price != float('inf'):
-        current_comparison['cheapest_buy_yes'] = {'platform': cheapest_buy_platform, 'price': cheapest_buy_price}
-    else:
-        current_comparison['cheapest_buy_yes'] = {'platform': None, 'price': float('inf')}
-    
-    if highest_sell_price != 0.0:
-        current_comparison['highest_sell_yes'] = {'platform': highest_sell_platform, 'price': highest_sell_price}
-    else:
-        current_comparison['highest_sell_yes'] = {'platform': None, 'price': 0.0}
+    cmp.buy_platform = cheapest_buy_platform
+    cmp.buy_price = cheapest_buy_price
+    cmp.sell_platform = highest_sell_platform if highest_sell_price != 0.0 else None
+    cmp.sell_price = highest_sell_price
+    cmp.arb_liquidity = 0.0
 
     # Optionally print current arbitrage opportunities with liquidity
     if cheapest_buy_book and highest_sell_book and \
        cheapest_buy_platform != highest_sell_platform: # Must be different platforms for arb
 
-        buy_price = current_comparison['cheapest_buy_yes']['price']
-        sell_price = current_comparison['highest_sell_yes']['price']
+        buy_price = cmp.buy_price
+        sell_price = cmp.sell_price
 
         # Only consider if there's a profitable spread greater than 0.01 (1 cent)
         if sell_price > buy_price + 0.01:
             profit_per_share = sell_price - buy_price
 
             # --- Calculate Arbitrage Liquidity ---
-            buy_liquidity = 0.0
-            # Iterate through asks on the 'cheapest_buy_book' until price exceeds 'sell_price'
-            for price, size in cheapest_buy_book.asks:
-                if price <= sell_price: # We can buy at this price or cheaper
-                    buy_liquidity += size
-                else:
-                    break # Prices are sorted, no more opportunities at better prices
-            
-            sell_liquidity = 0.0
-            # Iterate through bids on the 'highest_sell_book' until price falls below 'buy_price'
-            for price, size in highest_sell_book.bids:
-                if price >= buy_price: # We can sell at this price or higher
-                    sell_liquidity += size
-                else:
-                    break # Prices are sorted, no more opportunities at better prices
-            
+            # Asks we can buy at 'sell_price' or cheaper, bids we can sell into at 'buy_price' or higher
+            buy_liquidity = cheapest_buy_book.ask_depth_at_or_below(sell_price)
+            sell_liquidity = highest_sell_book.bid_depth_at_or_above(buy_price)
+
             arbitrage_liquidity = min(buy_liquidity, sell_liquidity)
+            cmp.arb_liquidity = arbitrage_liquidity
 
             logger.info(f"Arbitrage Opportunity for {canonical_name}:")
             logger.info(f"  Buy Yes on {cheapest_buy_platform} at {buy_price:.4f}")
@@ -166,106 +208,213 @@ def perform_cross_market_comparison(canonical_name: str):
             logger.info(f"  Potential Profit per Share: {profit_per_share:.4f}")
             logger.info(f"  Arbitrage Liquidity: {arbitrage_liquidity:.2f} shares (at current prices)")
 
-async def process_websocket_message(source: str, message: Dict[str, Any]):
+    if (cmp.buy_platform, cmp.buy_price, cmp.sell_platform, cmp.sell_price, cmp.arb_liquidity) != previous_state or \
+       _snapshot_due(canonical_name):
+        log_order_book_state_to_json(canonical_name)
+
+async def process_websocket_message(
+    source: int, message: Dict[str, Any],
+    _rlookup=REVERSE_MARKET_LOOKUP.get, _books=ALL_ORDER_BOOKS.get,
+    _upd_poly=update_polymarket_order_book, _upd_kalshi=update_kalshi_order_book, _cmps=MARKET_COMPARISON_DATA,
+):
     """
     Processes a message from the WebSocket queue, updates the relevant order book,
-    performs cross-market comparison if applicable, and logs the state to JSON.
+    and marks the market for comparison/logging if its top of book changed, or if it has an
+    open arbitrage (whose liquidity depends on levels below the top), or if its periodic
+    snapshot is due (so deep-level changes still reach the log).
+    The underscore defaults bind hot globals as locals; callers should not pass them.
     """
-    market_id = None
-    canonical_market_name = None
-
-    if source == 'polymarket':
-        market_id = message.get("asset_id")
-        if market_id:
-            canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
-            if not canonical_market_name:
-                logger.warning(f"Polymarket message for unmapped market_id: {market_id}")
-                return
-            order_book = ALL_ORDER_BOOKS.get(market_id)
-            if order_book:
-                update_polymarket_order_book(order_book, message)
-                logger.debug(f"Polymarket book for {market_id} updated.")
-            else:
-                logger.error(f"OrderBook instance not found for Polymarket market_id: {market_id}")
-                return
-
-    elif source == 'kalshi':
-        msg_content = message.get("msg", {})
-        market_id = msg_content.get("market_ticker")
-        if market_id:
-            canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
-            if not canonical_market_name:
-                logger.warning(f"Kalshi message for unmapped market_id: {market_id}")
-                return
-            order_book = ALL_ORDER_BOOKS.get(market_id)
-            if order_book:
-                update_kalshi_order_book(order_book, message)
-                logger.debug(f"Kalshi book for {market_id} updated.")
-            else:
-                logger.error(f"OrderBook instance not found for Kalshi market_id: {market_id}")
-                return
+    if source == SOURCE_POLYMARKET:
+        try:
+            market_id = message["asset_id"]
+        except KeyError:
+            return # Not a market event
+        canonical_market_name = _rlookup(market_id)
+        if not canonical_market_name:
+            logger.warning(f"Polymarket message for unmapped market_id: {market_id}")
+            return
+        order_book = _books(market_id)
+        if order_book:
+            top_before = (order_book.highest_bid, order_book.lowest_ask)
+            _upd_poly(order_book, message)
+            logger.debug("Polymarket book for %s updated.", market_id)
+        else:
+            logger.error(f"OrderBook instance not found for Polymarket market_id: {market_id}")
+            return
+
+    elif source == SOURCE_KALSHI:
+        try:
+            market_id = message["msg"]["market_ticker"]
+        except (KeyError, TypeError): # TypeError: "msg" is null
+            return # Not a market event
+        canonical_market_name = _rlookup(market_id)
+        if not canonical_market_name:
+            logger.warning(f"Kalshi message for unmapped market_id: {market_id}")
+            return
+        order_book = _books(market_id)
+        if order_book:
+            top_before = (order_book.highest_bid, order_book.lowest_ask)
+            _upd_kalshi(order_book, message)
+            logger.debug("Kalshi book for %s updated.", market_id)
+        else:
+            logger.error(f"OrderBook instance not found for Kalshi market_id: {market_id}")
+            return
     else:
         logger.warning(f"Unknown message source: {source}")
         return
-    if canonical_market_name:
-        logger.debug(f"Performing cross-market comparison for {canonical_market_name}")
-        perform_cross_market_comparison(canonical_market_name)
-        await log_order_book_state_to_json(canonical_market_name)
+    # Updates that only touched deeper levels can't change the best prices. They can only change
+    # the comparison through arb_liquidity, which is depth across the arb price band, and that
+    # is only nonzero while an arbitrage is open (opening one needs a top-of-book change).
+    if (order_book.highest_bid, order_book.lowest_ask) == top_before and \
+       not _cmps[canonical_market_name].arb_liquidity and not _snapshot_due(canonical_market_name):
+        return
+    DIRTY_MARKETS.add(canonical_market_name)
 
-async def log_order_book_state_to_json(canonical_name: str):
+async def comparison_flusher_task():
     """
-    Logs the current state of a specific canonical market's order books
-    and comparison data to a JSONL file.
+    Every COMPARISON_FLUSH_SECONDS, runs the cross-market comparison (which logs the
+    market if its comparison changed) once for each market marked dirty since the last pass, so bursts of updates to the
+    same market are coalesced. Started by start_background_tasks().
     """
+    global DIRTY_MARKETS
+    while True:
+        await asyncio.sleep(COMPARISON_FLUSH_SECONDS)
+        if not DIRTY_MARKETS:
+            continue
+        dirty, DIRTY_MARKETS = DIRTY_MARKETS, set()
+        for canonical_name in dirty:
+            logger.debug("Performing cross-market comparison for %s", canonical_name)
+            perform_cross_market_comparison(canonical_name)
+
+_BOOK_LOG_FIELDS = ("market_id", "last_updated_timestamp", "bids", "asks", "highest_bid", "lowest_ask",
+                    "bid_ask_spread", "mid_price", "total_bid_liquidity", "total_ask_liquidity")
+
+def _new_log_templates(canonical_name: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Builds the reusable (delta, snapshot) log entry dicts for a canonical market."""
     poly_book, kalshi_book = get_paired_books(canonical_name)
-    comparison_data = MARKET_COMPARISON_DATA.get(canonical_name)
-
-    log_entry = {
-        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
-        "canonical_market": canonical_name,
-        "polymarket_book": {},
-        "kalshi_book": {},
-        "comparison_data": comparison_data
+    delta = {
+        "type": "delta",
+        "seq": 0,
+        "ts": 0,
+        "m": canonical_name,
+        "pm": {"hb": None, "la": None},
+        "ks": {"hb": None, "la": None},
+        "al": 0.0, # arb_liquidity, so liquidity-only changes show up in the log
+    }
+    snapshot = {
+        "type": "snapshot",
+        "seq": 0,
+        "ts": 0,
+        "m": canonical_name,
+        # Books that don't exist for this market stay logged as {}
+        "polymarket_book": dict.fromkeys(_BOOK_LOG_FIELDS) if poly_book else {},
+        "kalshi_book": dict.fromkeys(_BOOK_LOG_FIELDS) if kalshi_book else {},
+        "comparison_data": None,
     }
+    return delta, snapshot
 
-    if poly_book:
-        log_entry["polymarket_book"] = {
-            "market_id": poly_book.market_id,
-            "last_updated_timestamp": poly_book.last_updated_timestamp,
-            "bids": poly_book.bids, # These are sorted lists of (price, size)
-            "asks": poly_book.asks,
-            "highest_bid": poly_book.highest_bid,
-            "lowest_ask": poly_book.lowest_ask,
-            "bid_ask_spread": poly_book.bid_ask_spread,
-            "mid_price": poly_book.mid_price,
-            "total_bid_liquidity": poly_book.total_bid_liquidity,
-            "total_ask_liquidity": poly_book.total_ask_liquidity,
-        }
-    
-    if kalshi_book:
-        log_entry["kalshi_book"] = {
-            "market_id": kalshi_book.market_id,
-            "last_updated_timestamp": kalshi_book.last_updated_timestamp,
-            "bids": kalshi_book.bids,
-            "asks": kalshi_book.asks,
-            "highest_bid": kalshi_book.highest_bid,
-            "lowest_ask": kalshi_book.lowest_ask,
-            "bid_ask_spread": kalshi_book.bid_ask_spread,
-            "mid_price": kalshi_book.mid_price,
-            "total_bid_liquidity": kalshi_book.total_bid_liquidity,
-            "total_ask_liquidity": kalshi_book.total_ask_liquidity,
-        }
+def _fill_book_log_entry(entry: Dict[str, Any], book: Optional[OrderBook]):
+    """Copies the current state of book into its snapshot template entry."""
+    if book is None:
+        return
+    entry["market_id"] = book.market_id
+    entry["last_updated_timestamp"] = book.last_updated_timestamp
+    entry["bids"] = book.bids # These are sorted lists of (price, size)
+    entry["asks"] = book.asks
+    entry["highest_bid"] = book.highest_bid
+    entry["lowest_ask"] = book.lowest_ask
+    entry["bid_ask_spread"] = book.bid_ask_spread
+    entry["mid_price"] = book.mid_price
+    entry["total_bid_liquidity"] = book.total_bid_liquidity
+    entry["total_ask_liquidity"] = book.total_ask_liquidity
+
+def _book_top(book: Optional[OrderBook]) -> Tuple[Optional[float], Optional[float]]:
+    """Returns (highest_bid, lowest_ask) for a book, or (None, None) if it doesn't exist."""
+    if book is None:
+        return None, None
+    return book.highest_bid, book.lowest_ask
+
+def _snapshot_due(canonical_name: str) -> bool:
+    """Whether SNAPSHOT_EVERY_SECONDS have passed since the market's last logged snapshot (or it has none)."""
+    return time.time_ns() - _LAST_SNAPSHOT_TIME.get(canonical_name, 0) >= _SNAPSHOT_EVERY_NS
+
+def log_order_book_state_to_json(canonical_name: str):
+    """
+    Queues the state of a specific canonical market for json_writer_task() to append to the
+    JSONL file. Called by perform_cross_market_comparison() only when the market's comparison
+    changed or a snapshot is due, so every call is logged: usually as a small "delta" line (both tops of book and
+    the arb liquidity), with a full "snapshot" line (both books and the comparison data)
+    every SNAPSHOT_EVERY_N_DELTAS deltas or SNAPSHOT_EVERY_SECONDS.
+    """
+    global _LOG_SEQ
+    poly_book, kalshi_book = get_paired_books(canonical_name)
+    poly_top = _book_top(poly_book)
+    kalshi_top = _book_top(kalshi_book)
+
+    now = time.time_ns() # Integer epoch nanoseconds; formatting is left to whoever reads the log
+    _LOG_SEQ += 1
+    deltas_since_snapshot = _DELTAS_SINCE_SNAPSHOT.get(canonical_name)
+    delta_entry, snapshot_entry = LOG_TEMPLATE[canonical_name]
+
+    if deltas_since_snapshot is not None and deltas_since_snapshot < SNAPSHOT_EVERY_N_DELTAS and \
+       now - _LAST_SNAPSHOT_TIME[canonical_name] < _SNAPSHOT_EVERY_NS:
+        _DELTAS_SINCE_SNAPSHOT[canonical_name] = deltas_since_snapshot + 1
+        log_entry = delta_entry
+        log_entry["pm"]["hb"], log_entry["pm"]["la"] = poly_top
+        log_entry["ks"]["hb"], log_entry["ks"]["la"] = kalshi_top
+        log_entry["al"] = MARKET_COMPARISON_DATA[canonical_name].arb_liquidity
+    else:
+        _DELTAS_SINCE_SNAPSHOT[canonical_name] = 0
+        _LAST_SNAPSHOT_TIME[canonical_name] = now
+        log_entry = snapshot_entry
+        _fill_book_log_entry(log_entry["polymarket_book"], poly_book)
+        _fill_book_log_entry(log_entry["kalshi_book"], kalshi_book)
+        log_entry["comparison_data"] = dataclasses.asdict(MARKET_COMPARISON_DATA[canonical_name])
+    log_entry["seq"] = _LOG_SEQ
+    log_entry["ts"] = now
 
     try:
-        # Open in append mode, write a single JSON line, then a newline
-        with open(JSON_OUTPUT_FILE_NAME, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-        logger.debug(f"Logged state for {canonical_name} to {JSON_OUTPUT_FILE_NAME}")
+        JSON_LOG_QUEUE.put_nowait(_dumps_line(log_entry))
+        logger.debug("Queued %s for %s to %s", log_entry["type"], canonical_name, JSON_OUTPUT_FILE_NAME)
     except Exception as e:
-        logger.error(f"Error writing to JSON log file: {e}")
+        logger.error(f"Error serializing JSON log entry: {e}")
+
+def _write_lines(fd: int, lines: list):
+    """Appends lines to fd, in one writev() syscall per IOV_MAX lines where available."""
+    if hasattr(os, "writev"):
+        for i in range(0, len(lines), _IOV_MAX):
+            os.writev(fd, lines[i:i + _IOV_MAX])
+    else: # Windows has no writev
+        os.write(fd, b"".join(lines))
+
+async def json_writer_task():
+    """
+    Drains JSON_LOG_QUEUE into JSON_OUTPUT_FILE_NAME through a single raw file
+    descriptor, writing lines in batches. Started by start_background_tasks().
+    """
+    batch = []
+    fd = os.open(JSON_OUTPUT_FILE_NAME, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        while True:
+            try:
+                batch.append(await asyncio.wait_for(JSON_LOG_QUEUE.get(), timeout=JSON_LOG_FLUSH_SECONDS))
+                if len(batch) < JSON_LOG_BATCH_SIZE:
+                    continue
+            except asyncio.TimeoutError:
+                if not batch:
+                    continue
+            _write_lines(fd, batch)
+            batch.clear()
+    finally:
+        # Don't lose whatever was pending when the task is cancelled
+        while not JSON_LOG_QUEUE.empty():
+            batch.append(JSON_LOG_QUEUE.get_nowait())
+        _write_lines(fd, batch)
+        os.close(fd)
 
 def save_output_to_file():
     """Saves the current state of order books and comparison data to a text file."""
+    import pprint # Only needed for this one-off dump, so keep it off the module import path
     logger.info(f"Saving output to {OUTPUT_FILE_NAME}...")
     with open(OUTPUT_FILE_NAME, "w") as f:
         f.write(f"--- Order Book Snapshot (as of {datetime.now().isoformat()}) ---\n\n")
@@ -278,8 +427,8 @@ def save_output_to_file():
         f.write("--- Cross-Market Comparison Data ---\n")
         for canonical_name, data in MARKET_COMPARISON_DATA.items():
             f.write(f"Market: {canonical_name}\n")
-            f.write(f"  Cheapest to Buy 'Yes': Platform={data['cheapest_buy_yes']['platform']}, Price={data['cheapest_buy_yes']['price']:.4f}\n")
-            f.write(f"  Highest to Sell 'Yes': Platform={data['highest_sell_yes']['platform']}, Price={data['highest_sell_yes']['price']:.4f}\n")
+            f.write(f"  Cheapest to Buy 'Yes': Platform={data.buy_platform}, Price={data.buy_price:.4f}\n")
+            f.write(f"  Highest to Sell 'Yes': Platform={data.sell_platform}, Price={data.sell_price:.4f}\n")
             f.write("-" * 40 + "\n")
         
         f.write("\n--- Raw Market Mapping ---\n")
@@ -290,52 +439,47 @@ def save_output_to_file():
         
     logger.info("Output saved successfully.")
 
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:.4f}" if value is not None else "N/A"
+
+def _book_summary_lines(platform: str, book: Optional[OrderBook]) -> list:
+    """Returns the printer lines for one platform's best bid/ask and spread."""
+    if not book:
+        return [f"  {platform}: N/A (Order Book not available)"]
+    return [
+        f"  {platform}:",
+        f"    Bid: {_fmt(book.highest_bid)}",
+        f"    Ask: {_fmt(book.lowest_ask)}",
+        f"    Spread: {_fmt(book.bid_ask_spread)}",
+    ]
+
 async def print_prices_periodically():
-    """Periodically prints the current best bid and ask for each platform and market."""
+    """
+    Periodically prints the current best bid and ask for each platform and market.
+    Each market is emitted as a single multi-line log record.
+    """
     while True:
         await asyncio.sleep(PRINT_INTERVAL_SECONDS)
+        if not logger.isEnabledFor(logging.INFO):
+            continue
         logger.info(f"\n--- Current Market Snapshot ({datetime.now().strftime('%H:%M:%S')}) ---")
 
         for canonical_name, comparison_data in MARKET_COMPARISON_DATA.items():
-            logger.info(f"\nMarket: {canonical_name}")
-
             # Get the individual order books for this market pair
             poly_book, kalshi_book = get_paired_books(canonical_name)
 
-            # Print Polymarket's Best Bid/Ask
-            if poly_book:
-                poly_highest_bid = poly_book.highest_bid
-                poly_lowest_ask = poly_book.lowest_ask
-                logger.info(f"  Polymarket:")
-                logger.info(f"    Bid: {poly_highest_bid:.4f}" if poly_highest_bid is not None else "    Bid: N/A")
-                logger.info(f"    Ask: {poly_lowest_ask:.4f}" if poly_lowest_ask is not None else "    Ask: N/A")
-                logger.info(f"    Spread: {poly_book.bid_ask_spread:.4f}" if poly_book.bid_ask_spread is not None else "    Spread: N/A")
-            else:
-                logger.info(f"  Polymarket: N/A (Order Book not available)")
-
-            # Print Kalshi's Best Bid/Ask
-            if kalshi_book:
-                kalshi_highest_bid = kalshi_book.highest_bid
-                kalshi_lowest_ask = kalshi_book.lowest_ask
-                logger.info(f"  Kalshi:")
-                logger.info(f"    Bid: {kalshi_highest_bid:.4f}" if kalshi_highest_bid is not None else "    Bid: N/A")
-                logger.info(f"    Ask: {kalshi_lowest_ask:.4f}" if kalshi_lowest_ask is not None else "    Ask: N/A")
-                logger.info(f"    Spread: {kalshi_book.bid_ask_spread:.4f}" if kalshi_book.bid_ask_spread is not None else "    Spread: N/A")
-            else:
-                logger.info(f"  Kalshi: N/A (Order Book not available)")
-            
-            # Print Global Best Prices (from cross-market comparison)
-            global_buy_platform = comparison_data['cheapest_buy_yes']['platform'] or 'N/A'
-            global_buy_price = comparison_data['cheapest_buy_yes']['price'] 
+            global_buy_price = comparison_data.buy_price
             global_buy_price_str = f"{global_buy_price:.4f}" if global_buy_price != float('inf') else 'N/A'
-            
-            global_sell_platform = comparison_data['highest_sell_yes']['platform'] or 'N/A'
-            global_sell_price = comparison_data['highest_sell_yes']['price']
+            global_sell_price = comparison_data.sell_price
             global_sell_price_str = f"{global_sell_price:.4f}" if global_sell_price != 0.0 else 'N/A'
 
-            logger.info(f"  --- Cross-Market Best ---")
-            logger.info(f"    Cheapest Buy 'Yes': {global_buy_platform} @ {global_buy_price_str}")
-            logger.info(f"    Highest Sell 'Yes': {global_sell_platform} @ {global_sell_price_str}")
+            lines = [f"\nMarket: {canonical_name}"]
+            lines += _book_summary_lines("Polymarket", poly_book)
+            lines += _book_summary_lines("Kalshi", kalshi_book)
+            # Global best prices (from cross-market comparison)
+            lines.append("  --- Cross-Market Best ---")
+            lines.append(f"    Cheapest Buy 'Yes': {comparison_data.buy_platform or 'N/A'} @ {global_buy_price_str}")
+            lines.append(f"    Highest Sell 'Yes': {comparison_data.sell_platform or 'N/A'} @ {global_sell_price_str}")
+            logger.info("\n".join(lines))
 
         logger.info("\n" + "=" * 80 + "\n") # Separator for next interval
-
@@ -8,6 +8,10 @@ from datetime import datetime, timedelta
 from enum import Enum
 import json
 import pprint as pp
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib decoder if orjson isn't installed
+    orjson = None
 
 from requests.exceptions import HTTPError
 
@@ -16,6 +20,7 @@ from cryptography.hazmat.primitives.asymmetric import padding, rsa
 from cryptography.exceptions import InvalidSignature
 
 import websockets
+from ws_options import WS_CONNECT_OPTIONS
 import asyncio # Added for WebSocket client's message_queue and async operations
 
 import logging
@@ -25,6 +30,25 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger('KalshiClient') # A dedicated logger for Kalshi client classes
 
 
+# Integer source tags put on queued messages (SOURCE_POLYMARKET = 0 lives in polymarket.wss)
+SOURCE_KALSHI = 1
+SOURCE_KALSHI_UPDATE = 2
+
+# When a client is created with keep_raw_frames=True, each queued message dict also carries
+# the undecoded websocket frame (bytes) under this key
+RAW_FRAME_KEY = "_raw_frame"
+
+# Decoder for inbound websocket frames. orjson's decode error subclasses json.JSONDecodeError,
+# so the except clauses below work with either.
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def kalshi_market_id(data):
+    """Returns the market ticker a queued Kalshi message (either source tag) refers to, or None."""
+    msg = data.get("msg")
+    return msg and msg.get("market_ticker")
+
+
 class Environment(Enum):
     DEMO = "demo"
     PROD = "prod"
@@ -75,7 +99,7 @@ class KalshiBaseClient:
         clean_path = path_parts[0]
 
         msg_string = timestamp_str + method + clean_path
-        self.logger.debug(f"Signing message string: '{msg_string}' for method {method} and path {clean_path}")
+        self.logger.debug("Signing message string: '%s' for method %s and path %s", msg_string, method, clean_path)
         signature = self.sign_pss_text(msg_string)
 
         headers = {
@@ -84,7 +108,7 @@ class KalshiBaseClient:
             "KALSHI-ACCESS-SIGNATURE": signature,
             "KALSHI-ACCESS-TIMESTAMP": timestamp_str,
         }
-        self.logger.debug(f"Generated headers for {method} {path}: {headers.keys()}")
+        self.logger.debug("Generated headers for %s %s: %s", method, path, headers.keys())
         return headers
 
     def sign_pss_text(self, text: str) -> str:
@@ -133,7 +157,7 @@ class KalshiHttpClient(KalshiBaseClient):
         time_since_last_call = now - self.last_api_call
         if time_since_last_call < timedelta(microseconds=threshold_in_microseconds):
             sleep_time = threshold_in_seconds - time_since_last_call.total_seconds()
-            self.logger.debug(f"Rate limit hit. Sleeping for {sleep_time:.4f} seconds.")
+            self.logger.debug("Rate limit hit. Sleeping for %.4f seconds.", sleep_time)
             time.sleep(sleep_time)
         self.last_api_call = datetime.now()
         self.logger.debug("Rate limit checked. API call proceeding.")
@@ -164,7 +188,8 @@ class KalshiHttpClient(KalshiBaseClient):
             )
             self.raise_if_bad_response(response)
             json_response = response.json()
-            self.logger.debug(f"POST request to {full_url} successful. Response: {json.dumps(json_response)}")
+            if self.logger.isEnabledFor(logging.DEBUG): # Skip re-serializing the response otherwise
+                self.logger.debug("POST request to %s successful. Response: %s", full_url, json.dumps(json_response))
             return json_response
         except HTTPError as e:
             self.logger.error(f"HTTPError during POST to {full_url}: {e}")
@@ -193,7 +218,8 @@ class KalshiHttpClient(KalshiBaseClient):
             )
             self.raise_if_bad_response(response)
             json_response = response.json()
-            self.logger.debug(f"GET request to {full_url} successful. Response: {json.dumps(json_response)}")
+            if self.logger.isEnabledFor(logging.DEBUG): # Skip re-serializing the response otherwise
+                self.logger.debug("GET request to %s successful. Response: %s", full_url, json.dumps(json_response))
             return json_response
         except HTTPError as e:
             self.logger.error(f"HTTPError during GET to {full_url}: {e}")
@@ -222,7 +248,8 @@ class KalshiHttpClient(KalshiBaseClient):
             )
             self.raise_if_bad_response(response)
             json_response = response.json()
-            self.logger.debug(f"DELETE request to {full_url} successful. Response: {json.dumps(json_response)}")
+            if self.logger.isEnabledFor(logging.DEBUG): # Skip re-serializing the response otherwise
+                self.logger.debug("DELETE request to %s successful. Response: %s", full_url, json.dumps(json_response))
             return json_response
         except HTTPError as e:
             self.logger.error(f"HTTPError during DELETE to {full_url}: {e}")
@@ -276,7 +303,8 @@ class KalshiWebSocketClient(KalshiBaseClient):
         private_key: rsa.RSAPrivateKey,
         environment: Environment, # EDITED: Corrected type hint from Environment.DEMO to Environment
         message_queue: Optional[asyncio.Queue], # Make message_queue explicit for constructor
-        ticker_list: list
+        ticker_list: list,
+        keep_raw_frames: bool = False # Attach each frame's raw bytes under RAW_FRAME_KEY
     ):
         super().__init__(key_id, private_key, environment)
         self.ws = None
@@ -286,6 +314,9 @@ class KalshiWebSocketClient(KalshiBaseClient):
         self.logger = logger.getChild('WebSocketClient') # Child logger
         self.ticker_list = ticker_list 
         self.server_id=0
+        self.source = SOURCE_KALSHI
+        self.update_source = SOURCE_KALSHI_UPDATE
+        self.keep_raw_frames = keep_raw_frames
 
 
     async def connect(self): # EDITED: Removed tickers_to_subscribe argument here
@@ -295,7 +326,7 @@ class KalshiWebSocketClient(KalshiBaseClient):
         self.logger.info(f"Attempting to connect to Kalshi WebSocket: {host}")
 
         try:
-            self.ws = await websockets.connect(host, additional_headers=auth_headers, proxy=None)
+            self.ws = await websockets.connect(host, additional_headers=auth_headers, proxy=None, **WS_CONNECT_OPTIONS)
             self.logger.info(f"Successfully connected to Kalshi WebSocket: {host}")
             await self.subscribe_to_tickers() # This method uses self.ticker_list
         except websockets.ConnectionClosed as e:
@@ -373,7 +404,9 @@ class KalshiWebSocketClient(KalshiBaseClient):
         try:
             async for message in self.ws:
                 try:
-                    data=json.loads(message)
+                    data=_loads(message)
+                    if self.keep_raw_frames:
+                        data[RAW_FRAME_KEY] = message.encode() if isinstance(message, str) else message
                     await self.on_message(data)
                 except json.JSONDecodeError as e:
                     self.logger.warning(f"Failed to decode JSON from WebSocket message: {e}. Message: {message[:200]}...")
@@ -395,18 +428,18 @@ class KalshiWebSocketClient(KalshiBaseClient):
             try:
                 event_type=data.get("type", "unknown")
                 if event_type in ["orderbook_snapshot", "orderbook_delta"]:
-                    await self.message_queue.put(('kalshi', data))
-                    self.logger.debug(f"Put '{event_type}' event into queue from Kalshi.")
+                    await self.message_queue.put((self.source, data))
+                    self.logger.debug("Put '%s' event into queue from Kalshi.", event_type)
                 elif event_type == "market_lifecycle_v2":
-                    await self.message_queue.put(('update', data)) # Consider a more specific key if 'update' is general
-                    self.logger.debug(f"Put '{event_type}' event into queue from Kalshi.")
+                    await self.message_queue.put((self.update_source, data))
+                    self.logger.debug("Put '%s' event into queue from Kalshi.", event_type)
                     pp.pprint(data)
                 else:
                     if event_type in ["subscribed", "error"]:
                         pp.pprint(data)
                     self.logger.info(f"Unkown Kalshi event called {event_type}")
             except Exception as e:
-                self.logger.error(f"Error putting message into queue: {e}. Message data: {json.dumps(data)}", exc_info=True)
+                self.logger.error(f"Error putting message into queue: {e}. Message data: {json.dumps(data, default=str)}", exc_info=True)
         else:
             self.logger.warning("No message queue set for Kalshi WebSocket. Message will not be processed by consumer.")
 
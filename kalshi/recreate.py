@@ -17,8 +17,7 @@ def update_kalshi_order_book(order_book: OrderBook, data: Dict[str, Any]):
     
     # --- Full Snapshot (from "yes" and "no" keys) ---
     if "yes" in data and "no" in data:
-        order_book._bids.clear()
-        order_book._asks.clear()
+        order_book.clear()
 
         # The 'yes' book (e.g., a user wants to SELL Yes at this price)
         # We now interpret this as a BUYER'S desire to buy Yes.
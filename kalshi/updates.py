@@ -28,8 +28,7 @@ def update_kalshi_order_book(order_book: OrderBook, data: Dict[str, Any]):
 
     if msg_type == "orderbook_snapshot":
         # This is a full snapshot
-        order_book._bids = {} # Clear existing book
-        order_book._asks = {} # Clear existing book
+        order_book.clear() # Clear existing book
 
         # "yes" side in Kalshi represents asks for "Yes" shares directly
         for level in msg_content.get("yes", []):
@@ -76,17 +75,17 @@ def update_kalshi_order_book(order_book: OrderBook, data: Dict[str, Any]):
             if side == "yes": # Kalshi 'yes' is asks for Yes shares directly
                 target_price = kalshi_raw_price_dollars
                 update_side = 'bid'
-                current_book = order_book._asks
+                current_book_side = 'ask'
             elif side == "no": # Kalshi 'no' is bids for Yes shares (derived from 1 - No_Price)
                 target_price = 1.0 - kalshi_raw_price_dollars
                 target_price = max(0.0, round(target_price, 4)) # Round for consistency
                 update_side = 'ask'
-                current_book = order_book._bids
+                current_book_side = 'bid'
             else:
                 print(f"Warning: Unknown Kalshi side '{side}' in delta: {msg_content}")
                 return # Skip this update
 
-            current_size = current_book.get(target_price, 0.0)
+            current_size = order_book.get_liquidity_at_price(target_price, current_book_side)
             new_size = current_size + float(delta_size)
 
             order_book._update_book_level(update_side, target_price, new_size)
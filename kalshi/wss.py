@@ -38,9 +38,10 @@ class KalshiWSS(KalshiWebSocketClient):
         private_key: rsa.RSAPrivateKey,
         environment: Environment.DEMO,
         message_queue: asyncio.Queue,
-        ticker_list: list
+        ticker_list: list,
+        keep_raw_frames: bool = False
     ):
-        super().__init__(key_id, private_key, environment, message_queue, ticker_list)
+        super().__init__(key_id, private_key, environment, message_queue, ticker_list, keep_raw_frames)
         self.message_queue=message_queue
         self.ticker_list = ticker_list
 
@@ -8,6 +8,10 @@ from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 import sys
 import math
+try:
+    import uvloop # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
 
 # Import clients and logic
 from kalshi.clients import Environment, KalshiHttpClient
@@ -15,10 +19,12 @@ from py_clob_client.client import ClobClient, ApiCreds
 from cryptography.hazmat.primitives import serialization
 
 # Import the new WSS classes
-from polymarket.wss import PolymarketWSS, POLYMARKET_WSS_URI
+from polymarket.wss import PolymarketWSS, POLYMARKET_WSS_URI, SOURCE_POLYMARKET
 from kalshi.wss import KalshiWSS
+from kalshi.clients import SOURCE_KALSHI
 
 from order_book import OrderBook
+from clob_client_pool import get_or_create_creds
 from polymarket.updates import update_polymarket_order_book
 from kalshi.updates import update_kalshi_order_book
 from orders.tor_manager import start_tor, stop_tor, ping_tor
@@ -36,6 +42,9 @@ ALL_ORDER_BOOKS: Dict[str, OrderBook] = {}
 REVERSE_MARKET_LOOKUP: Dict[str, str] = {}
 REVERSE_COMPLEMENTARY_PAIRS: Dict[str, str] = {}
 LAST_GAME_TRADE_ATTEMPT: Dict[Tuple[str, str], float] = {}
+# Subscription ids per platform, deduplicated in MARKET_MAPPING order
+POLY_ASSET_IDS: Tuple[str, ...] = tuple(dict.fromkeys(m["polymarket"] for m in MARKET_MAPPING.values() if "polymarket" in m))
+KALSHI_TICKERS: Tuple[str, ...] = tuple(dict.fromkeys(m["kalshi"] for m in MARKET_MAPPING.values() if "kalshi" in m))
 
 import logging
 import sys
@@ -188,14 +197,14 @@ def check_game_arbitrage(canonical_name_updated: str):
     if check_and_execute_arbitrage_pair(kalshi_book_a, "Kalshi", poly_book_b, "Polymarket", game_key):
         return # Trade found, exit
 
-async def process_websocket_message(source: str, message: Dict[str, Any]):
+async def process_websocket_message(source: int, message: Dict[str, Any]):
     """Processes a message, updates the relevant order book, and checks for arbitrage."""
     market_id = None
-    if source == 'polymarket':
+    if source == SOURCE_POLYMARKET:
         market_id = message.get("asset_id")
         if market_id in ALL_ORDER_BOOKS:
             update_polymarket_order_book(ALL_ORDER_BOOKS[market_id], message)
-    elif source == 'kalshi':
+    elif source == SOURCE_KALSHI:
         market_id = message.get("msg", {}).get("market_ticker")
         if market_id in ALL_ORDER_BOOKS:
             update_kalshi_order_book(ALL_ORDER_BOOKS[market_id], message)
@@ -214,13 +223,17 @@ async def process_messages_from_queue(queue: asyncio.Queue):
             await process_websocket_message(source, message)
         except Exception as e:
             logger.error(f"Error processing message from {source}: {e}")
-        queue.task_done()
 
 async def run_trader():
     """Main function to start Tor, initialize clients, and listen to websockets."""
     global polymarket_client, kalshi_client, PROXIES
     PROXIES=None
 
+    # Python 3.12+: trade tasks start executing as soon as they're created
+    eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_task_factory is not None:
+        asyncio.get_running_loop().set_task_factory(eager_task_factory)
+
 
     try:
         logger.info("Temporarily setting proxy environment variables for ClobClient initialization...")
@@ -233,7 +246,7 @@ async def run_trader():
             funder=POLYMARKET_PROXY_ADDRESS
         )
 
-        api_creds = poly_client.create_or_derive_api_creds()
+        api_creds = get_or_create_creds(poly_client, WALLET_PRIVATE_KEY)
 
         AUTH = {
             'apiKey': api_creds.api_key,
@@ -276,8 +289,8 @@ async def run_trader():
 
     message_queue = asyncio.Queue()
 
-    poly_ids = [m["polymarket"] for m in MARKET_MAPPING.values() if "polymarket" in m]
-    kalshi_ids = [m["kalshi"] for m in MARKET_MAPPING.values() if "kalshi" in m]
+    poly_ids = list(POLY_ASSET_IDS)
+    kalshi_ids = list(KALSHI_TICKERS)
     
     poly_ws = PolymarketWSS(
         uri=POLYMARKET_WSS_URI,
@@ -315,6 +328,8 @@ async def run_trader():
 
 if __name__ == "__main__":
     try:
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(run_trader())
     except KeyboardInterrupt:
         logger.info("Process interrupted by user. Shutting down.")
\ No newline at end of file
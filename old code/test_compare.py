@@ -3,7 +3,7 @@ import logging
 import asyncio
 import time
 from typing import Dict, Any, Optional, Tuple
-from compare import initialize_market_data, process_websocket_message, print_prices_periodically, initialize_globals
+from compare import initialize_market_data, process_websocket_message, print_prices_periodically, stop_background_tasks, configure_logging
 from polymarket.wss import PolymarketWSS, POLYMARKET_MARKET_WSS_URI
 from kalshi.wss import KalshiWSS, env, KEYID, private_key
 from config import poly_asset_ids_to_subscribe, kalshi_tickers_to_subscribe, RUN_DURATION_MINUTES, JSON_OUTPUT_FILE_NAME
@@ -12,8 +12,6 @@ from config import poly_asset_ids_to_subscribe, kalshi_tickers_to_subscribe, RUN
 
 
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 async def main():
@@ -80,6 +78,7 @@ async def main():
                 printer_task,
                 return_exceptions=True
             )
+            await stop_background_tasks()
             
             await kalshi_wss.disconnect()
             await polymarket_wss.disconnect()
@@ -92,6 +91,7 @@ async def main():
         logger.error("Could not start listener, connection to one or more WebSockets failed.")
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         # Remove the old text output file if it exists, to start fresh JSONL
         try:
@@ -1,6 +1,108 @@
 import math
 from typing import Dict, List, Tuple, Optional, Union
 
+import numpy as np
+
+class _BookSide:
+    """
+    One side of an OrderBook: levels kept in ascending search-key order in preallocated
+    float64 arrays, so index 0 is always the best level. Ask keys are prices, bid keys
+    are negated prices. Inserts and removals shift the tail in place with numpy slice
+    copies and the arrays double when full.
+    """
+    __slots__ = ("sign", "keys", "sizes", "n", "_arrays")
+
+    _INITIAL_CAPACITY = 64
+
+    def __init__(self, sign: float):
+        self.sign = sign # +1.0 for asks, -1.0 for bids
+        self.keys = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        self.sizes = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        self.n = 0
+        # Lazily built (prices, sizes, search_keys, cum_sizes); None means stale.
+        # cum_sizes[i] is the total size of the best i levels.
+        self._arrays: Optional[Tuple[np.ndarray, ...]] = None
+
+    def clear(self):
+        self.n = 0
+        self._arrays = None
+
+    def _index(self, key: float) -> int:
+        return int(np.searchsorted(self.keys[:self.n], key))
+
+    def set(self, price: float, size: float):
+        """Sets the size at price, removing the level if size is 0 or less."""
+        key = self.sign * price
+        keys, sizes, n = self.keys, self.sizes, self.n
+        i = self._index(key)
+        if i < n and keys[i] == key:
+            if size <= 0:
+                keys[i:n - 1] = keys[i + 1:n]
+                sizes[i:n - 1] = sizes[i + 1:n]
+                self.n = n - 1
+            else:
+                sizes[i] = size
+        elif size > 0:
+            if n == len(keys):
+                self.keys = keys = np.concatenate((keys, np.empty_like(keys)))
+                self.sizes = sizes = np.concatenate((sizes, np.empty_like(sizes)))
+            keys[i + 1:n + 1] = keys[i:n]
+            sizes[i + 1:n + 1] = sizes[i:n]
+            keys[i] = key
+            sizes[i] = size
+            self.n = n + 1
+        else:
+            return
+        self._arrays = None
+
+    def load(self, prices: np.ndarray, sizes: np.ndarray):
+        """
+        Replaces every level with parallel price/size arrays in any order. As with
+        repeated set() calls, the last entry for a price wins and sizes <= 0 are dropped.
+        """
+        # np.unique keeps the first occurrence, so search the reversed arrays to keep the last
+        keys, last = np.unique(self.sign * prices[::-1], return_index=True)
+        sizes = sizes[::-1][last]
+        live = sizes > 0
+        keys, sizes = keys[live], sizes[live]
+        n = len(keys)
+        if n > len(self.keys):
+            self.keys = np.empty(2 * n, dtype=np.float64)
+            self.sizes = np.empty(2 * n, dtype=np.float64)
+        self.keys[:n] = keys
+        self.sizes[:n] = sizes
+        self.n = n
+        self._arrays = None
+
+    def get(self, price: float) -> float:
+        """Returns the size at price, or 0.0 if there is no such level."""
+        key = self.sign * price
+        i = self._index(key)
+        return float(self.sizes[i]) if i < self.n and self.keys[i] == key else 0.0
+
+    def best_price(self) -> Optional[float]:
+        return float(self.sign * self.keys[0]) if self.n else None
+
+    def total_size(self) -> float:
+        return float(self.sizes[:self.n].sum())
+
+    def levels(self) -> List[Tuple[float, float]]:
+        """Returns (price, size) tuples, best level first."""
+        prices, sizes = self.arrays()[:2]
+        return list(zip(prices.tolist(), sizes.tolist()))
+
+    def arrays(self) -> Tuple[np.ndarray, ...]:
+        """Returns the cached (prices, sizes, search_keys, cum_sizes) arrays, rebuilding them if stale."""
+        if self._arrays is None:
+            n = self.n
+            keys = self.keys[:n].copy()
+            sizes = self.sizes[:n].copy()
+            cum_sizes = np.zeros(n + 1, dtype=np.float64)
+            np.cumsum(sizes, out=cum_sizes[1:])
+            self._arrays = (keys if self.sign > 0 else -keys), sizes, keys, cum_sizes
+        return self._arrays
+
+
 class OrderBook:
     """
     A general order book class that stores bid and ask prices and sizes,
@@ -16,47 +118,102 @@ class OrderBook:
                              (e.g., Polymarket's asset_id/market hash, Kalshi's market_ticker).
         """
         self.market_id: str = market_id
-        self._bids: Dict[float, float] = {}  # Price -> Size (Bid side)
-        self._asks: Dict[float, float] = {}  # Price -> Size (Ask side)
+        self._bids = _BookSide(-1.0)  # Sorted by price descending
+        self._asks = _BookSide(1.0)   # Sorted by price ascending
         self.last_updated_timestamp: Optional[int] = None # Unix timestamp in milliseconds
 
+    def clear(self):
+        """Removes every level from both sides of the book."""
+        self._bids.clear()
+        self._asks.clear()
+
+    def _side(self, side: str) -> _BookSide:
+        side_lower = side.lower()
+        if side_lower == 'bid':
+            return self._bids
+        elif side_lower == 'ask':
+            return self._asks
+        raise ValueError(f"Invalid side: {side}. Must be 'bid' or 'ask'.")
+
     def _update_book_level(self, side: str, price: float, size: float):
         """
         Internal helper to update a single price level in the order book.
         If size is 0 or less, the price level is removed.
         """
-        if side.lower() == 'bid':
-            book = self._bids
-        elif side.lower() == 'ask':
-            book = self._asks
-        else:
-            raise ValueError(f"Invalid side: {side}. Must be 'bid' or 'ask'.")
+        self._side(side).set(price, size)
 
-        if size <= 0:
-            if price in book:
-                del book[price]
-        else:
-            book[price] = size
+    def _load_book_side(self, side: str, prices: np.ndarray, sizes: np.ndarray):
+        """
+        Internal helper to replace one whole side of the book from parallel float64
+        price/size arrays (any order), e.g. when applying a snapshot.
+        """
+        self._side(side).load(prices, sizes)
 
     @property
     def bids(self) -> List[Tuple[float, float]]:
         """Returns a list of (price, size) tuples for bids, sorted by price descending."""
-        return sorted(self._bids.items(), key=lambda item: item[0], reverse=True)
+        return self._bids.levels()
 
     @property
     def asks(self) -> List[Tuple[float, float]]:
         """Returns a list of (price, size) tuples for asks, sorted by price ascending."""
-        return sorted(self._asks.items(), key=lambda item: item[0])
+        return self._asks.levels()
+
+    @property
+    def bid_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns bids as parallel (prices, sizes) float64 arrays, sorted by price descending."""
+        return self._bids.arrays()[:2]
+
+    @property
+    def ask_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns asks as parallel (prices, sizes) float64 arrays, sorted by price ascending."""
+        return self._asks.arrays()[:2]
+
+    @property
+    def bid_depth_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (search_keys, cum_sizes) for bids: search_keys are the negated prices (ascending)
+        and cum_sizes[i] is the total size of the best i levels.
+        """
+        return self._bids.arrays()[2:]
+
+    @property
+    def ask_depth_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (search_keys, cum_sizes) for asks: search_keys are the prices (ascending)
+        and cum_sizes[i] is the total size of the best i levels.
+        """
+        return self._asks.arrays()[2:]
+
+    def bid_depth_at_or_above(self, price: float) -> float:
+        """Returns the total bid size at prices >= price."""
+        _, _, keys, cum_sizes = self._bids.arrays()
+        return float(cum_sizes[np.searchsorted(keys, -price, side="right")])
+
+    def ask_depth_at_or_below(self, price: float) -> float:
+        """Returns the total ask size at prices <= price."""
+        _, _, keys, cum_sizes = self._asks.arrays()
+        return float(cum_sizes[np.searchsorted(keys, price, side="right")])
+
+    def ask_depth_below_combined(self, other_price: float, limit: float) -> float:
+        """
+        Returns the total ask size at prices p with p + other_price < limit, evaluated as that
+        float sum. Comparing p < limit - other_price instead rounds differently and can count
+        a level that sits exactly at the limit.
+        """
+        prices, _, _, cum_sizes = self._asks.arrays()
+        # Float addition is monotonic, so the sums stay sorted
+        return float(cum_sizes[np.searchsorted(prices + other_price, limit, side="left")])
 
     @property
     def highest_bid(self) -> Optional[float]:
         """Returns the highest bid price, or None if no bids."""
-        return max(self._bids.keys()) if self._bids else None
+        return self._bids.best_price()
 
     @property
     def lowest_ask(self) -> Optional[float]:
         """Returns the lowest ask price, or None if no asks."""
-        return min(self._asks.keys()) if self._asks else None
+        return self._asks.best_price()
 
     @property
     def bid_ask_spread(self) -> Optional[float]:
@@ -75,12 +232,12 @@ class OrderBook:
     @property
     def total_bid_liquidity(self) -> float:
         """Calculates the total size of all bids in the book."""
-        return sum(self._bids.values())
+        return self._bids.total_size()
 
     @property
     def total_ask_liquidity(self) -> float:
         """Calculates the total size of all asks in the book."""
-        return sum(self._asks.values())
+        return self._asks.total_size()
 
     @property
     def total_book_liquidity(self) -> float:
@@ -92,12 +249,7 @@ class OrderBook:
         Returns the liquidity (size) at a specific price level for a given side.
         Returns 0 if the price level does not exist.
         """
-        if side.lower() == 'bid':
-            return self._bids.get(price, 0.0)
-        elif side.lower() == 'ask':
-            return self._asks.get(price, 0.0)
-        else:
-            raise ValueError(f"Invalid side: {side}. Must be 'bid' or 'ask'.")
+        return self._side(side).get(price)
 
     def get_market_depth(self, num_levels: int = 5) -> Dict[str, List[Tuple[float, float]]]:
         """
@@ -1,42 +1,32 @@
-import os
-from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs, OrderType
-from py_clob_client.order_builder.constants import BUY
-from py_clob_client.clob_types import ApiCreds
-from dotenv import load_dotenv
-from py_clob_client.constants import POLYGON
-
-load_dotenv()
+import sys
+from pathlib import Path
 
-host = "https://clob.polymarket.com"
-key = os.getenv("WALLET_PRIVATE_KEY")
-#key = os.getenv("CLOB_API_KEY")
-POLYMARKET_PROXY_ADDRESS=os.getenv("POLYMARKET_PROXY_ADDRESS")
-creds = ApiCreds(
-    api_key=os.getenv("CLOB_API_KEY"),
-    api_secret=os.getenv("CLOB_SECRET"),
-    api_passphrase=os.getenv("CLOB_PASS_PHRASE"),
-)
-chain_id = 137
-#client = ClobClient(host, key=key, chain_id=chain_id, creds=creds)
+# Run as a script, sys.path[0] is this folder ("old code" can't be run with -m), so put the repo
+# root on the path for clob_client_pool
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-client = ClobClient(host, key=key, chain_id=chain_id, signature_type=1, funder=POLYMARKET_PROXY_ADDRESS)
-
-client.set_api_creds(client.create_or_derive_api_creds()) 
+from py_clob_client.clob_types import OrderArgs, OrderType
+from py_clob_client.order_builder.constants import BUY
+from clob_client_pool import get_clob_client
 
 
-order_args = OrderArgs(
-    side=BUY,
-    token_id="41514409204811681957297914647439181721960830322421349815421512981934146077920",
-    size=6.0, # $$$
-    price=0.19
-)
+def place_market_buy(token_id, size, price, order_type=OrderType.FOK):
+    """Buys size contracts of token_id at up to price, using the shared ClobClient."""
+    client = get_clob_client()
 
+    order_args = OrderArgs(
+        side=BUY,
+        token_id=token_id,
+        size=size, # $$$
+        price=price
+    )
 
+    signed_order = client.create_order(order_args)
 
+    ## FOK Order
+    return client.post_order(signed_order, order_type)
 
-signed_order = client.create_order(order_args)
 
-## FOK Order
-resp = client.post_order(signed_order, OrderType.FOK)
-print(resp)
+if __name__ == "__main__":
+    resp = place_market_buy("41514409204811681957297914647439181721960830322421349815421512981934146077920", 6.0, 0.19)
+    print(resp)
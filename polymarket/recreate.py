@@ -12,8 +12,7 @@ def update_polymarket_order_book(order_book: OrderBook, data: Dict[str, Any]):
 
     # Full snapshot
     if event_type == "book":
-        order_book._bids.clear()
-        order_book._asks.clear()
+        order_book.clear()
         
         changes = data.get("changes", {})
         for bid in changes.get("bids", []):
@@ -2,6 +2,8 @@
 from order_book import OrderBook
 from typing import Dict, Any
 
+import numpy as np
+
 def update_polymarket_order_book(order_book: OrderBook, data: Dict[str, Any]):
     """
     Updates a Polymarket OrderBook instance based on a WSS message.
@@ -31,26 +33,23 @@ def update_polymarket_order_book(order_book: OrderBook, data: Dict[str, Any]):
 
     if event_type == "book":
         # This is a full snapshot
-        order_book._bids = {} # Clear existing book
-        order_book._asks = {} # Clear existing book
-
-        for bid in data.get("bids", []):
-            try:
-                price = float(bid["price"])
-                size = float(bid["size"])
-                order_book._update_book_level('bid', price, size)
-            except (ValueError, KeyError) as e:
-                print(f"Error parsing Polymarket bid data: {bid} - {e}")
-                continue
+        order_book.clear() # Clear existing book
 
-        for ask in data.get("asks", []):
+        for side, levels in (('bid', data.get("bids", [])), ('ask', data.get("asks", []))):
+            # Parse each side straight into parallel arrays and load them in one go
             try:
-                price = float(ask["price"])
-                size = float(ask["size"])
-                order_book._update_book_level('ask', price, size)
-            except (ValueError, KeyError) as e:
-                print(f"Error parsing Polymarket ask data: {ask} - {e}")
+                count = len(levels)
+                prices = np.fromiter((level["price"] for level in levels), dtype=np.float64, count=count)
+                sizes = np.fromiter((level["size"] for level in levels), dtype=np.float64, count=count)
+            except (ValueError, KeyError, TypeError):
+                # A malformed level: apply the side level by level, skipping the bad entries
+                for level in levels:
+                    try:
+                        order_book._update_book_level(side, float(level["price"]), float(level["size"]))
+                    except (ValueError, KeyError, TypeError) as e:
+                        print(f"Error parsing Polymarket {side} data: {level} - {e}")
                 continue
+            order_book._load_book_side(side, prices, sizes)
         # print(f"Polymarket: Snapshot updated for {order_book.market_id}")
 
     elif event_type == "price_change":
@@ -1,7 +1,12 @@
 import asyncio
 import websockets
+from ws_options import WS_CONNECT_OPTIONS
 import json
 import logging
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib decoder if orjson isn't installed
+    orjson = None
 import pprint as pp
 
 # Configure logging
@@ -10,6 +15,17 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Polymarket CLOB WebSocket base URI
 POLYMARKET_WSS_URI = "wss://ws-subscriptions-clob.polymarket.com/ws/"
 
+# Integer source tag put on queued market messages (see kalshi.clients for the Kalshi tags)
+SOURCE_POLYMARKET = 0
+
+# Decoder for inbound websocket frames. orjson's decode error subclasses json.JSONDecodeError,
+# so the except clauses below work with either.
+_loads = orjson.loads if orjson is not None else json.loads
+
+def polymarket_market_id(data):
+    """Returns the asset id a queued Polymarket market event refers to, or None."""
+    return data.get("asset_id")
+
 class PolymarketWSS:
     def __init__(self, uri, asset_ids, message_queue, auth):
         self.base_uri = uri
@@ -20,6 +36,7 @@ class PolymarketWSS:
         self.auth = auth
         self.market =None
         self.user = None
+        self.source = SOURCE_POLYMARKET
 
     async def connect(self):
         """Connects to both the market and user Polymarket WebSockets concurrently."""
@@ -55,7 +72,7 @@ class PolymarketWSS:
     async def _connect_to_endpoint(self, uri):
         """A helper function to connect to a single WebSocket endpoint."""
         try:
-            return await websockets.connect(uri)
+            return await websockets.connect(uri, **WS_CONNECT_OPTIONS)
         except Exception as e:
             logging.error(f"Error connecting to {uri}: {e}")
             return None # Return exception to be handled by the gather call
@@ -117,7 +134,7 @@ class PolymarketWSS:
             try:
                 async for message in websocket:
                     try:
-                        all_events = json.loads(message)
+                        all_events = _loads(message)
                         if not isinstance(all_events, list):
                             all_events = [all_events]
 
@@ -130,8 +147,8 @@ class PolymarketWSS:
                                 #await self.message_queue.put(('polymarket_user', data))
                             else:
                                 if event_type in ["book", "price_change", "tick_size_change", "last_trade_price"]:
-                                    await self.message_queue.put(('polymarket', data))
-                                    logging.debug(f"Put {event_type} event into queue from Polymarket {name}")
+                                    await self.message_queue.put((self.source, data))
+                                    logging.debug("Put %s event into queue from Polymarket %s", event_type, name)
                                 else:
                                     logging.info(f"Received non-standard event from Polymarket {name}: {data}")
 
@@ -168,7 +185,7 @@ class PolymarketWSS:
         if self.user and not self.user.closed:
             try:
                 await self.user.send(json.dumps(message))
-                logging.debug(f"Sent to Polymarket User channel: {message}")
+                logging.debug("Sent to Polymarket User channel: %s", message)
             except Exception as e:
                 logging.error(f"Error sending message to User WebSocket: {e}")
         else:
@@ -204,4 +221,4 @@ class PolymarketWSS:
             await self.connect()
             logging.info("Polymarket WSS reconnected with updated subscriptions.")
         else:
-            logging.debug(f"Asset ID {asset_id} not in active subscriptions, no action needed for unsubscribe.")
\ No newline at end of file
+            logging.debug("Asset ID %s not in active subscriptions, no action needed for unsubscribe.", asset_id)
\ No newline at end of file
@@ -2,8 +2,8 @@ import json
 import csv
 import logging
 import math
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta, timezone
 import os
 import copy
 import heapq
@@ -67,7 +67,7 @@ def robust_update_polymarket_order_book(book: OrderBook, data: Dict[str, Any]):
         book._bids.clear(); book._asks.clear()
         for bid in data.get("changes", {}).get("bids", []): book._update_book_level('bid', float(bid['price']), float(bid['size']))
         for ask in data.get("changes", {}).get("asks", []): book._update_book_level('ask', float(ask['price']), float(ask['size']))
-    elif event_type == "delta":
+    elif event_type in ("delta", "diff"): # "diff" is a logged book snapshot reduced to its changed levels
         for change in data.get("changes", []):
             side = 'bid' if change['side'] == 'BUY' else 'ask'
             book._update_book_level(side, float(change['price']), float(change['size']))
@@ -95,6 +95,18 @@ def robust_update_kalshi_order_book(book: OrderBook, data: Dict[str, Any]):
 
 
 # --- Setup and Helper Functions (mostly unchanged) ---
+def read_log_lines(path):
+    """
+    Returns the lines of a JSONL log with NUL bytes dropped: a log whose writer died before
+    closing it ends in (or, if later appended to, contains) a run of zero padding.
+    """
+    with open(path, 'r') as f:
+        return f.read().replace('\0', '').splitlines()
+
+def parse_log_ts(ts: Any) -> Optional[datetime]:
+    """Log "ts" is integer epoch nanoseconds in current logs and an ISO-8601 string in older ones."""
+    if isinstance(ts, int): return datetime.fromtimestamp(ts / 1e9, tz=timezone.utc)
+    return datetime.fromisoformat(ts.replace('Z', '+00:00')) if ts else None
 def setup_logging(): logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
 def load_market_data():
     global MARKET_MAPPING
@@ -166,9 +178,11 @@ def process_log_entry(log_entry: Dict[str, Any], order_books: Dict[str, OrderBoo
     if "pm_delta" in log_entry:
         market_id = MARKET_MAPPING.get(canonical_name, {}).get("polymarket")
         if market_id and market_id in order_books: robust_update_polymarket_order_book(order_books[market_id], log_entry["pm_delta"])
-    elif "ks_delta" in log_entry:
+    elif "ks_delta" in log_entry or "ks_frame" in log_entry:
+        # "ks_frame" is the whole raw Kalshi websocket frame; its "msg" holds the same fields as ks_delta
+        ks_delta = log_entry["ks_delta"] if "ks_delta" in log_entry else log_entry["ks_frame"].get("msg", {})
         market_id = MARKET_MAPPING.get(canonical_name, {}).get("kalshi")
-        if market_id and market_id in order_books: robust_update_kalshi_order_book(order_books[market_id], log_entry["ks_delta"])
+        if market_id and market_id in order_books: robust_update_kalshi_order_book(order_books[market_id], ks_delta)
 
 # --- CHANGE 2: EFFICIENT OPPORTUNITY FINDING ---
 def find_opportunities(current_order_books: Dict[str, OrderBook]) -> List[Dict]:
@@ -218,26 +232,26 @@ def run_normal_mode():
         if "polymarket" in market: order_books[market["polymarket"]] = OrderBook(market["polymarket"])
         if "kalshi" in market: order_books[market["kalshi"]] = OrderBook(market["kalshi"])
 
-    with open(JSONL_FILE_PATH, 'r') as f:
-        lines = f.readlines()
-        total_lines = len(lines)
-        logging.info(f"Loaded {total_lines} log entries. Starting replay...")
-        for i, line in enumerate(lines):
-            if (i + 1) % 50000 == 0: logging.info(f"Progress: {i + 1}/{total_lines} lines ({((i + 1)/total_lines)*100:.2f}%) processed...")
-            try: log_entry = json.loads(line)
-            except json.JSONDecodeError: continue
-            process_log_entry(log_entry, order_books)
-            timestamp, c_name = log_entry.get('ts', ''), log_entry.get("name")
-            is_targeted = TARGETED_DEBUG_CONFIG['enabled'] and TARGETED_DEBUG_CONFIG['market_name'] == c_name and TARGETED_DEBUG_CONFIG['timestamp_contains'] in timestamp
-            if is_targeted:
-                print("\n" + "#"*80 + f"\n### TARGETED DEBUG: State AFTER processing entry at {timestamp} ###")
-                poly_id, kalshi_id = MARKET_MAPPING.get(c_name, {}).get("polymarket"), MARKET_MAPPING.get(c_name, {}).get("kalshi")
-                print(_format_book_for_debug(order_books.get(poly_id), "Polymarket")); print(_format_book_for_debug(order_books.get(kalshi_id), "Kalshi") + "#"*80)
-            opportunities = find_opportunities(order_books)
-            if is_targeted and not opportunities: print("--- No opportunities found at this targeted debug point. ---")
-            for opp in opportunities:
-                if (is_targeted and opp.get('market_name') == c_name) or not TARGETED_DEBUG_CONFIG['enabled']:
-                     _execute_and_log_opportunity(opp, order_books, timestamp)
+    lines = read_log_lines(JSONL_FILE_PATH)
+    total_lines = len(lines)
+    logging.info(f"Loaded {total_lines} log entries. Starting replay...")
+    for i, line in enumerate(lines):
+        if (i + 1) % 50000 == 0: logging.info(f"Progress: {i + 1}/{total_lines} lines ({((i + 1)/total_lines)*100:.2f}%) processed...")
+        try: log_entry = json.loads(line)
+        except json.JSONDecodeError: continue
+        process_log_entry(log_entry, order_books)
+        parsed_ts, c_name = parse_log_ts(log_entry.get('ts')), log_entry.get("name")
+        timestamp = parsed_ts.isoformat() if parsed_ts else ''
+        is_targeted = TARGETED_DEBUG_CONFIG['enabled'] and TARGETED_DEBUG_CONFIG['market_name'] == c_name and TARGETED_DEBUG_CONFIG['timestamp_contains'] in timestamp
+        if is_targeted:
+            print("\n" + "#"*80 + f"\n### TARGETED DEBUG: State AFTER processing entry at {timestamp} ###")
+            poly_id, kalshi_id = MARKET_MAPPING.get(c_name, {}).get("polymarket"), MARKET_MAPPING.get(c_name, {}).get("kalshi")
+            print(_format_book_for_debug(order_books.get(poly_id), "Polymarket")); print(_format_book_for_debug(order_books.get(kalshi_id), "Kalshi") + "#"*80)
+        opportunities = find_opportunities(order_books)
+        if is_targeted and not opportunities: print("--- No opportunities found at this targeted debug point. ---")
+        for opp in opportunities:
+            if (is_targeted and opp.get('market_name') == c_name) or not TARGETED_DEBUG_CONFIG['enabled']:
+                 _execute_and_log_opportunity(opp, order_books, timestamp)
     logging.info(f"Normal run complete. Found {TRADE_ID_COUNTER} profitable trades.")
     cleanup()
 
@@ -258,16 +272,15 @@ def run_delay_mode():
         
         # CHANGE 4: Load file into memory ONCE
         try:
-            with open(JSONL_FILE_PATH, 'r') as f:
-                logging.info(f"Loading {JSONL_FILE_PATH} into memory...")
-                lines = f.readlines()
+            logging.info(f"Loading {JSONL_FILE_PATH} into memory...")
+            lines = read_log_lines(JSONL_FILE_PATH)
             parsed_lines = []
             for line in lines:
                 try:
                     log_entry = json.loads(line)
-                    ts_str = log_entry.get('ts', '').replace('Z', '+00:00')
-                    if ts_str:
-                        log_entry['parsed_ts'] = datetime.fromisoformat(ts_str)
+                    parsed_ts = parse_log_ts(log_entry.get('ts'))
+                    if parsed_ts:
+                        log_entry['parsed_ts'] = parsed_ts
                         parsed_lines.append(log_entry)
                 except (json.JSONDecodeError, AttributeError, ValueError):
                     continue
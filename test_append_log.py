@@ -0,0 +1,40 @@
+import os
+
+from append_log import MmapAppendLog
+
+
+def _crash(log):
+    # What dying before close() leaves behind: the written pages, but no trim of the padding
+    log.flush()
+    log._mm.close()
+    os.close(log._fd)
+
+
+def test_reopen_after_crash_trims_padding_and_torn_line(tmp_path):
+    path = str(tmp_path / "deltas.jsonl")
+    log = MmapAppendLog(path, 64)
+    log.write(b'{"a": 1}\n')
+    log.write(b'{"b": 2}\n')
+    log.write(b'{"c": ') # Torn: the process died mid-line
+    _crash(log)
+    with open(path, "rb") as f:
+        assert f.read().endswith(b"\0") # Chunk padding is still there
+
+    log = MmapAppendLog(path, 64)
+    log.write(b'{"d": 4}\n')
+    log.close()
+    with open(path, "rb") as f:
+        assert f.read() == b'{"a": 1}\n{"b": 2}\n{"d": 4}\n'
+
+
+def test_reopen_after_close_appends(tmp_path):
+    path = str(tmp_path / "deltas.jsonl")
+    log = MmapAppendLog(path, 8) # Smaller than one line, so writes also grow the mapping
+    log.write(b'{"a": 1}\n')
+    log.close()
+
+    log = MmapAppendLog(path, 8)
+    log.write(b'{"b": 2}\n')
+    log.close()
+    with open(path, "rb") as f:
+        assert f.read() == b'{"a": 1}\n{"b": 2}\n'
@@ -1,16 +1,37 @@
 import asyncio
+import collections
+import dataclasses
+import io
 import logging
 import pprint
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple, List, Callable
 import time
-from datetime import datetime, timezone
+from datetime import datetime
 import json
 import os # For file operations
+import numpy as np
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib encoder/decoder if orjson isn't installed
+    orjson = None
+try:
+    import uvloop # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+try:
+    from numba import njit
+except ImportError: # Without numba the kernels below just run as plain NumPy code
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 # Import your classes and functions
-from polymarket.wss import PolymarketWSS, POLYMARKET_MARKET_WSS_URI
+from polymarket.wss import PolymarketWSS, POLYMARKET_MARKET_WSS_URI, polymarket_market_id
 from kalshi.wss import KalshiWSS, env, KEYID, private_key
+from kalshi.clients import kalshi_market_id, RAW_FRAME_KEY
 from order_book import OrderBook
+from append_log import MmapAppendLog
 # Assuming your updates are in polymarket/updates.py and kalshi/updates.py relative to main.py
 from polymarket.updates import update_polymarket_order_book
 from kalshi.updates import update_kalshi_order_book
@@ -20,15 +41,32 @@ RUN_DURATION_MINUTES = None # Set to None for infinite run until Ctrl+C
 INITIAL_STATE_FILE_NAME = "jsons/initial_order_books.json" # For the full initial snapshot
 ORDER_BOOK_CHANGES_FILE_NAME = "jsons/order_book_deltas_jul_6.jsonl" # For subsequent raw updates (JSON Lines)
 PRINT_INTERVAL_SECONDS = 1000000000 # Keep this high as we log changes on event now
+MESSAGE_QUEUE_MAXSIZE = 1024 # WSS listeners wait in put() once this many messages are unrouted
+NUM_MESSAGE_WORKERS = 4 # Messages are sharded across this many workers by market id
+WORKER_QUEUE_MAXSIZE = 256 # The consumer waits once a worker has this many messages pending
+DELTA_BATCH_SIZE = 256 # Max delta log entries written per queue drain
+DELTA_LOG_CHUNK_BYTES = 256 << 20 # The mmap'd deltas log grows by this much at a time
+DELTA_LOG_SYNC_SECONDS = 1.0 # How often dirty deltas log pages are synced to disk
 
 # File names for market mappings
 MARKETS_FILE = 'jsons/markets_07_06.json'
 COMP_FILE = 'jsons/compliment_07_06.json'
 
+def _load_json_file(path: str) -> Any:
+    """Reads and decodes a JSON file. Decode errors are json.JSONDecodeError (orjson's subclasses it)."""
+    with open(path, "rb") as json_file:
+        data = json_file.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _dumps_line(obj: Any) -> bytes:
+    """Serializes obj to a compact, newline-terminated JSON line as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, separators=(',', ':')) + "\n").encode()
+
 # --- Load Market Mappings from Files ---
 try:
-    with open(MARKETS_FILE) as json_file:
-        MARKET_MAPPING: Dict[str, Dict[str, str]] = json.load(json_file)
+    MARKET_MAPPING: Dict[str, Dict[str, str]] = _load_json_file(MARKETS_FILE)
     logging.info(f"Loaded MARKET_MAPPING from {MARKETS_FILE}")
 except FileNotFoundError:
     logging.error(f"Error: {MARKETS_FILE} not found. Please create it with your market definitions.")
@@ -38,8 +76,7 @@ except json.JSONDecodeError:
     MARKET_MAPPING = {}
 
 try:
-    with open(COMP_FILE) as json_file:
-        COMPLEMENTARY_MARKET_PAIRS: Dict[str, str] = json.load(json_file)
+    COMPLEMENTARY_MARKET_PAIRS: Dict[str, str] = _load_json_file(COMP_FILE)
     logging.info(f"Loaded COMPLEMENTARY_MARKET_PAIRS from {COMP_FILE}")
 except FileNotFoundError:
     logging.warning(f"Warning: {COMP_FILE} not found. Cross-outcome arbitrage will not be performed.")
@@ -48,11 +85,44 @@ except json.JSONDecodeError:
     logging.error(f"Error: Could not decode JSON from {COMP_FILE}. Check file format.")
     COMPLEMENTARY_MARKET_PAIRS = {}
 
+# Deduplicated (a, b) complementary pairs with a < b, both present in MARKET_MAPPING
+CROSS_PAIRS: List[Tuple[str, str]] = sorted({
+    tuple(sorted((market_a_name, market_b_name)))
+    for market_a_name, market_b_name in COMPLEMENTARY_MARKET_PAIRS.items()
+    if market_a_name in MARKET_MAPPING and market_b_name in MARKET_MAPPING
+})
+
+# Subscription ids per platform; dict.fromkeys dedupes while keeping MARKET_MAPPING order,
+# so subscriptions are reproducible
+POLY_ASSET_IDS: Tuple[str, ...] = tuple(dict.fromkeys(
+    market_ids["polymarket"] for market_ids in MARKET_MAPPING.values() if "polymarket" in market_ids
+))
+KALSHI_TICKERS: Tuple[str, ...] = tuple(dict.fromkeys(
+    market_ids["kalshi"] for market_ids in MARKET_MAPPING.values() if "kalshi" in market_ids
+))
+
 
 # --- Global Storage for Order Books and Comparison Data ---
+@dataclasses.dataclass(slots=True)
+class MarketPair:
+    """A canonical market's books on each platform (None if it isn't listed there)."""
+    poly: Optional[OrderBook]
+    kalshi: Optional[OrderBook]
+
 ALL_ORDER_BOOKS: Dict[str, OrderBook] = {}
 REVERSE_MARKET_LOOKUP: Dict[str, str] = {} # Maps native_id -> canonical_name
-MARKET_COMPARISON_DATA: Dict[str, Dict[str, Any]] = {} # Stores comparison for each canonical market
+# One zero-argument cross-outcome check per CROSS_PAIRS pair, built by _build_arb_tasks()
+_ARB_TASKS: List[Callable[[], None]] = []
+PAIRS: Dict[str, MarketPair] = {} # canonical_name -> MarketPair, built in initialize_market_data()
+# native_id -> (canonical_name, own OrderBook, MarketPair), so a message resolves everything it needs with one lookup
+MARKET_INDEX: Dict[str, Tuple[str, OrderBook, MarketPair]] = {}
+# Markets updated since the last _flush_dirty_markets() call: canonical_name -> MarketPair
+DIRTY_MARKETS: Dict[str, MarketPair] = {}
+_dirty_flush_handle: Optional[asyncio.Handle] = None
+DELTA_LOG_QUEUE: asyncio.Queue = asyncio.Queue() # Delta log entries waiting for delta_writer_task()
+# asset_id -> {(side, price): (price string, size)} as a deltas log reader would currently have it, so Polymarket
+# "book" snapshots after the first can be logged as a diff. Sides use the price_change BUY/SELL names.
+_LOGGED_POLY_LEVELS: Dict[str, Dict[Tuple[str, float], Tuple[str, float]]] = {}
 
 # --- Logging Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -78,174 +148,146 @@ async def initialize_market_data():
             REVERSE_MARKET_LOOKUP[kalshi_id] = canonical_name
             logger.info(f"  Added Kalshi book for {kalshi_id}")
 
-        # Initialize comparison data for each canonical market
-        MARKET_COMPARISON_DATA[canonical_name] = {
-            'cheapest_buy_yes': {'platform': None, 'price': float('inf')},
-            'highest_sell_yes': {'platform': None, 'price': 0.0},
-            'same_outcome_arbitrage_liquidity': 0.0 # Liquidity for (buy Yes / sell Yes) arb
-        }
+        pair = MarketPair(
+            ALL_ORDER_BOOKS.get(market_ids.get("polymarket")),
+            ALL_ORDER_BOOKS.get(market_ids.get("kalshi")),
+        )
+        PAIRS[canonical_name] = pair
+        for own_book in (pair.poly, pair.kalshi):
+            if own_book:
+                MARKET_INDEX[own_book.market_id] = (canonical_name, own_book, pair)
+    _build_arb_tasks()
     logger.info("All market data structures initialized.")
 
 
-def get_paired_books(canonical_name: str) -> Tuple[Optional[OrderBook], Optional[OrderBook]]:
+def _build_arb_tasks():
     """
-    Retrieves the Polymarket and Kalshi OrderBook instances for a given canonical market name.
-    Returns (polymarket_book, kalshi_book).
+    Builds one closure per CROSS_PAIRS pair with both markets' books already resolved,
+    so checking cross-outcome arbitrage needs no mapping lookups.
     """
-    poly_book = None
-    kalshi_book = None
-    market_ids = MARKET_MAPPING.get(canonical_name)
-    if market_ids:
-        if "polymarket" in market_ids:
-            poly_book = ALL_ORDER_BOOKS.get(market_ids["polymarket"])
-        if "kalshi" in market_ids:
-            kalshi_book = ALL_ORDER_BOOKS.get(market_ids["kalshi"])
-    return poly_book, kalshi_book
+    _ARB_TASKS.clear()
+    for market_a_name, market_b_name in CROSS_PAIRS:
+        def arb_task(a=market_a_name, b=market_b_name, books_a=_platform_books(market_a_name), books_b=_platform_books(market_b_name)):
+            if a in PAIRS and b in PAIRS:
+                find_cross_outcome_arbitrage(a, b, books_a, books_b)
+            else:
+                logger.debug("Skipping cross-outcome check for %s <-> %s as one or both are no longer actively tracked.", a, b)
+        _ARB_TASKS.append(arb_task)
 
 
-def perform_cross_market_comparison(canonical_name: str):
+def _best_ask(books) -> Tuple[float, Optional[str], Optional[OrderBook]]:
     """
-    Compares prices for a given canonical market across Polymarket and Kalshi
-    and updates MARKET_COMPARISON_DATA for the SAME outcome.
-    Calculates and prints liquidity for arbitrage opportunities.
+    Returns (lowest_ask, platform, book) over (platform, book) pairs, or (inf, None, None)
+    if no book has an ask. The first of equal prices wins.
     """
-    poly_book, kalshi_book = get_paired_books(canonical_name)
+    best_price, best_platform, best_book = float('inf'), None, None
+    for platform, book in books:
+        if book and book.lowest_ask is not None and book.lowest_ask < best_price:
+            best_price, best_platform, best_book = book.lowest_ask, platform, book
+    return best_price, best_platform, best_book
 
-    current_comparison = MARKET_COMPARISON_DATA[canonical_name]
 
-    cheapest_buy_price = float('inf')
-    cheapest_buy_platform = None
-    cheapest_buy_book: Optional[OrderBook] = None
-    
-    highest_sell_price = 0.0
-    highest_sell_platform = None
-    highest_sell_book: Optional[OrderBook] = None
-
-    # Compare for cheapest buy (lowest ask)
-    if poly_book and poly_book.lowest_ask is not None:
-        if poly_book.lowest_ask < cheapest_buy_price:
-            cheapest_buy_price = poly_book.lowest_ask
-            cheapest_buy_platform = "Polymarket"
-            cheapest_buy_book = poly_book
-        elif poly_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform is None:
-            cheapest_buy_platform = "Polymarket"
-            cheapest_buy_book = poly_book
-
-    if kalshi_book and kalshi_book.lowest_ask is not None:
-        if kalshi_book.lowest_ask < cheapest_buy_price:
-            cheapest_buy_price = kalshi_book.lowest_ask
-            cheapest_buy_platform = "Kalshi"
-            cheapest_buy_book = kalshi_book
-        elif kalshi_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform == "Polymarket":
-            pass # Keep Polymarket if already set and price is equal
-        elif kalshi_book.lowest_ask == cheapest_buy_price and cheapest_buy_platform is None:
-            cheapest_buy_platform = "Kalshi"
-            cheapest_buy_book = kalshi_book
-
-    # Compare for highest sell (highest bid)
-    if poly_book and poly_book.highest_bid is not None:
-        if poly_book.highest_bid > highest_sell_price:
-            highest_sell_price = poly_book.highest_bid
-            highest_sell_platform = "Polymarket"
-            highest_sell_book = poly_book
-        elif poly_book.highest_bid == highest_sell_price and highest_sell_platform is None:
-            highest_sell_platform = "Polymarket"
-            highest_sell_book = poly_book
-    
-    if kalshi_book and kalshi_book.highest_bid is not None:
-        if kalshi_book.highest_bid > highest_sell_price:
-            highest_sell_price = kalshi_book.highest_bid
-            highest_sell_platform = "Kalshi"
-            highest_sell_book = kalshi_book
-        elif kalshi_book.highest_bid == highest_sell_price and highest_sell_platform == "Polymarket":
-            pass # Keep Polymarket if already set and price is equal
-        elif kalshi_book.highest_bid == highest_sell_price and highest_sell_platform is None:
-            highest_sell_platform = "Kalshi"
-            highest_sell_book = kalshi_book
-
-    # Update global comparison data
-    if cheapest_buy_price != float('inf'):
-        current_comparison['cheapest_buy_yes'] = {'platform': cheapest_buy_platform, 'price': cheapest_buy_price}
-    else:
-        current_comparison['cheapest_buy_yes'] = {'platform': None, 'price': float('inf')}
-    
-    if highest_sell_price != 0.0:
-        current_comparison['highest_sell_yes'] = {'platform': highest_sell_platform, 'price': highest_sell_price}
-    else:
-        current_comparison['highest_sell_yes'] = {'platform': None, 'price': 0.0}
+def _best_bid(books) -> Tuple[float, Optional[str], Optional[OrderBook]]:
+    """
+    Returns (highest_bid, platform, book) over (platform, book) pairs, or (0.0, None, None)
+    if no book has a positive bid. The first of equal prices wins.
+    """
+    best_price, best_platform, best_book = 0.0, None, None
+    for platform, book in books:
+        if book and book.highest_bid is not None and book.highest_bid > best_price:
+            best_price, best_platform, best_book = book.highest_bid, platform, book
+    return best_price, best_platform, best_book
 
-    # Calculate and store SAME outcome arbitrage liquidity
-    same_outcome_arbitrage_liquidity = 0.0 
-    if cheapest_buy_book and highest_sell_book and \
-       cheapest_buy_platform != highest_sell_platform: # Must be different platforms for arb
-
-        buy_price = current_comparison['cheapest_buy_yes']['price']
-        sell_price = current_comparison['highest_sell_yes']['price']
-
-        # Only consider if there's a profitable spread greater than 0.01 (1 cent)
-        if sell_price > buy_price + 0.01:
-            profit_per_share = sell_price - buy_price
-
-            buy_liquidity_depth = 0.0
-            # Iterate through asks on the 'cheapest_buy_book' until price exceeds 'sell_price'
-            for price, size in cheapest_buy_book.asks:
-                if price <= sell_price: # We can buy at this price or cheaper
-                    buy_liquidity_depth += size
-                else:
-                    break # Prices are sorted, no more opportunities at better prices
-            
-            sell_liquidity_depth = 0.0
-            # Iterate through bids on the 'highest_sell_book' until price falls below 'buy_price'
-            for price, size in highest_sell_book.bids:
-                if price >= buy_price: # We can sell at this price or higher
-                    sell_liquidity_depth += size
-                else:
-                    break # Prices are sorted, no more opportunities at better prices
-            
-            same_outcome_arbitrage_liquidity = min(buy_liquidity_depth, sell_liquidity_depth)
 
-            logger.info(f"Same-Outcome Arbitrage Opportunity for {canonical_name}:")
-            logger.info(f"  Buy Yes on {cheapest_buy_platform} at {buy_price:.4f}")
-            logger.info(f"  Sell Yes on {highest_sell_platform} at {sell_price:.4f}")
-            logger.info(f"  Potential Profit per Share: {profit_per_share:.4f}")
-            logger.info(f"  Arbitrage Liquidity: {same_outcome_arbitrage_liquidity:.2f} shares")
-    
-    current_comparison['same_outcome_arbitrage_liquidity'] = same_outcome_arbitrage_liquidity
+@njit(cache=True)
+def _same_outcome_liquidity(ask_keys, ask_cum_sizes, bid_keys, bid_cum_sizes, buy_price, sell_price):
+    """
+    Returns min(ask size at <= sell_price, bid size at >= buy_price) from OrderBook
+    ask_depth_arrays/bid_depth_arrays (bid keys are negated prices).
+    """
+    buy_liquidity_depth = ask_cum_sizes[np.searchsorted(ask_keys, sell_price, side='right')]
+    sell_liquidity_depth = bid_cum_sizes[np.searchsorted(bid_keys, -buy_price, side='right')]
+    return min(buy_liquidity_depth, sell_liquidity_depth)
 
 
-def find_cross_outcome_arbitrage(market_a_canonical_name: str, market_b_canonical_name: str):
+def _compare_pair(pair: MarketPair) -> Tuple[Optional[str], float, Optional[str], float, float]:
+    """
+    Returns (cheapest_buy_platform, cheapest_buy_price, highest_sell_platform, highest_sell_price,
+    same_outcome_arbitrage_liquidity) for the SAME outcome across Polymarket and Kalshi, read
+    straight off the books. Prices are inf / 0.0 when no book has an ask / bid.
+    """
+    # Cheapest buy (lowest ask) and highest sell (highest bid); Polymarket wins ties
+    books = (("Polymarket", pair.poly), ("Kalshi", pair.kalshi))
+    cheapest_buy_price, cheapest_buy_platform, cheapest_buy_book = _best_ask(books)
+    highest_sell_price, highest_sell_platform, highest_sell_book = _best_bid(books)
+
+    same_outcome_arbitrage_liquidity = 0.0
+    # Must be different platforms, with a profitable spread greater than 0.01 (1 cent)
+    if cheapest_buy_book and highest_sell_book and \
+       cheapest_buy_platform != highest_sell_platform and \
+       highest_sell_price > cheapest_buy_price + 0.01:
+        # Asks we can buy at 'sell_price' or cheaper, bids we can sell into at 'buy_price' or higher
+        same_outcome_arbitrage_liquidity = float(_same_outcome_liquidity(
+            *cheapest_buy_book.ask_depth_arrays, *highest_sell_book.bid_depth_arrays,
+            cheapest_buy_price, highest_sell_price
+        ))
+    return (cheapest_buy_platform, cheapest_buy_price, highest_sell_platform, highest_sell_price,
+            same_outcome_arbitrage_liquidity)
+
+
+def perform_cross_market_comparison(
+    canonical_name: str,
+    pair: Optional[MarketPair] = None,
+) -> Tuple[Optional[str], float, Optional[str], float, float]:
+    """
+    Compares prices for a given canonical market across Polymarket and Kalshi
+    for the SAME outcome and prints liquidity for arbitrage opportunities.
+    Returns the _compare_pair() tuple; nothing is stored.
+    Callers already holding the market's MarketPair can pass it to skip the PAIRS lookup.
+    """
+    if pair is None:
+        pair = PAIRS[canonical_name]
+    comparison = _compare_pair(pair)
+    buy_platform, buy_price, sell_platform, sell_price, same_outcome_arbitrage_liquidity = comparison
+
+    if same_outcome_arbitrage_liquidity > 0 and logger.isEnabledFor(logging.INFO):
+        logger.info(f"Same-Outcome Arbitrage Opportunity for {canonical_name}:")
+        logger.info(f"  Buy Yes on {buy_platform} at {buy_price:.4f}")
+        logger.info(f"  Sell Yes on {sell_platform} at {sell_price:.4f}")
+        logger.info(f"  Potential Profit per Share: {sell_price - buy_price:.4f}")
+        logger.info(f"  Arbitrage Liquidity: {same_outcome_arbitrage_liquidity:.2f} shares")
+    return comparison
+
+
+def _platform_books(canonical_name: str) -> Tuple[Tuple[str, OrderBook], ...]:
+    """Returns the (platform, book) pairs for a canonical market, keyed by MARKET_MAPPING platform name."""
+    return tuple(
+        (platform_name, ALL_ORDER_BOOKS[market_id])
+        for platform_name, market_id in MARKET_MAPPING.get(canonical_name, {}).items()
+        if market_id in ALL_ORDER_BOOKS
+    )
+
+
+def find_cross_outcome_arbitrage(
+    market_a_canonical_name: str,
+    market_b_canonical_name: str,
+    books_a: Optional[Tuple[Tuple[str, OrderBook], ...]] = None,
+    books_b: Optional[Tuple[Tuple[str, OrderBook], ...]] = None,
+):
     """
     Finds arbitrage opportunity by buying 'Yes' on market A and buying 'Yes' on market B,
     where A and B are complementary outcomes of the same event.
     For example, Buy Yes (Detroit Wins) + Buy Yes (Washington Wins) < 1.00.
+    books_a/books_b are the markets' (platform, book) pairs; they're looked up if not given.
     """
-    # Get the best available 'Yes' ask for Market A across all platforms
-    lowest_ask_a = float('inf')
-    platform_a_for_buy = None
-    book_a_for_buy: Optional[OrderBook] = None
-    
-    market_a_ids = MARKET_MAPPING.get(market_a_canonical_name, {})
-    for platform_name, market_id in market_a_ids.items(): # platform_name can be "polymarket" or "kalshi"
-        book = ALL_ORDER_BOOKS.get(market_id)
-        if book and book.lowest_ask is not None:
-            if book.lowest_ask < lowest_ask_a:
-                lowest_ask_a = book.lowest_ask
-                platform_a_for_buy = platform_name
-                book_a_for_buy = book
-
-    # Get the best available 'Yes' ask for Market B across all platforms
-    lowest_ask_b = float('inf')
-    platform_b_for_buy = None
-    book_b_for_buy: Optional[OrderBook] = None
-    
-    market_b_ids = MARKET_MAPPING.get(market_b_canonical_name, {})
-    for platform_name, market_id in market_b_ids.items(): # platform_name can be "polymarket" or "kalshi"
-        book = ALL_ORDER_BOOKS.get(market_id)
-        if book and book.lowest_ask is not None:
-            if book.lowest_ask < lowest_ask_b:
-                lowest_ask_b = book.lowest_ask
-                platform_b_for_buy = platform_name
-                book_b_for_buy = book
+    # Get the best available 'Yes' ask for each market across all platforms
+    # (platform names here are the MARKET_MAPPING keys, "polymarket" or "kalshi")
+    lowest_ask_a, platform_a_for_buy, book_a_for_buy = _best_ask(
+        books_a if books_a is not None else _platform_books(market_a_canonical_name)
+    )
+    lowest_ask_b, platform_b_for_buy, book_b_for_buy = _best_ask(
+        books_b if books_b is not None else _platform_books(market_b_canonical_name)
+    )
 
     # Proceed only if we found valid asks for both markets
     if lowest_ask_a == float('inf') or lowest_ask_b == float('inf') or \
@@ -262,26 +304,15 @@ def find_cross_outcome_arbitrage(market_a_canonical_name: str, market_b_canonica
         # We're buying 'Yes' on market A and 'Yes' on market B.
         # Liquidity is limited by the available asks on each side, considering the counterparty price.
         
-        buy_a_liquidity_depth = 0.0
-        # Iterate through asks on market A. The arb is profitable as long as
-        # A's price + B's best ask is still < 1.0 minus profit margin.
-        for price_a, size_a in book_a_for_buy.asks:
-            if price_a + lowest_ask_b < 1.0 - 0.01: # Check if this specific level for A is still profitable with best B
-                buy_a_liquidity_depth += size_a
-            else:
-                break
-        
-        buy_b_liquidity_depth = 0.0
-        # Iterate through asks on market B.
-        for price_b, size_b in book_b_for_buy.asks:
-            if price_b + lowest_ask_a < 1.0 - 0.01: # Check if this specific level for B is still profitable with best A
-                buy_b_liquidity_depth += size_b
-            else:
-                break
+        # The arb is profitable at a level of A as long as A's price + B's best ask
+        # is still < 1.0 minus profit margin (and likewise for B against A's best ask).
+        buy_a_liquidity_depth = book_a_for_buy.ask_depth_below_combined(lowest_ask_b, 1.0 - 0.01)
+        buy_b_liquidity_depth = book_b_for_buy.ask_depth_below_combined(lowest_ask_a, 1.0 - 0.01)
         
         cross_outcome_arbitrage_liquidity = min(buy_a_liquidity_depth, buy_b_liquidity_depth)
 
-        if cross_outcome_arbitrage_liquidity > 0: # Only log if there's actual liquidity
+        # Only log if there's actual liquidity
+        if cross_outcome_arbitrage_liquidity > 0 and logger.isEnabledFor(logging.INFO):
             logger.info(f"Cross-Outcome Arbitrage Opportunity: {market_a_canonical_name} + {market_b_canonical_name}:")
             logger.info(f"  Buy Yes on {market_a_canonical_name} ({platform_a_for_buy}) at {lowest_ask_a:.4f}")
             logger.info(f"  Buy Yes on {market_b_canonical_name} ({platform_b_for_buy}) at {lowest_ask_b:.4f}")
@@ -314,15 +345,12 @@ def process_book_data_for_initial(book: OrderBook) -> Dict[str, Any]:
     }
 
 # Helper to clean and round comparison data for JSON logging
-def process_comparison_data(data: Dict[str, Any]) -> Dict[str, Any]:
-    if not data:
+def process_comparison_data(pair: Optional[MarketPair]) -> Dict[str, Any]:
+    if not pair:
         return {}
 
-    cheapest_buy_price = data['cheapest_buy_yes']['price']
-    cheapest_buy_platform = data['cheapest_buy_yes']['platform']
-
-    highest_sell_price = data['highest_sell_yes']['price']
-    highest_sell_platform = data['highest_sell_yes']['platform']
+    cheapest_buy_platform, cheapest_buy_price, highest_sell_platform, highest_sell_price, \
+        same_outcome_arbitrage_liquidity = _compare_pair(pair)
 
     cb_price = round(cheapest_buy_price, 4) if cheapest_buy_price != float('inf') else None
     hs_price = round(highest_sell_price, 4) if highest_sell_price != 0.0 else None 
@@ -330,7 +358,7 @@ def process_comparison_data(data: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "cb": {"p": cheapest_buy_platform, "pr": cb_price}, # cheapest_buy_yes: platform, price
         "hs": {"p": highest_sell_platform, "pr": hs_price}, # highest_sell_yes: platform, price
-        "sal": round(data['same_outcome_arbitrage_liquidity'], 2) # same_outcome_arbitrage_liquidity
+        "sal": round(same_outcome_arbitrage_liquidity, 2) # same_outcome_arbitrage_liquidity
     }
 
 
@@ -340,7 +368,7 @@ async def log_initial_state_to_json():
     This is called once at the start.
     """
     initial_state_data = {
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": time.time_ns(), # Integer epoch nanoseconds; readers format it if needed
         "markets": []
     }
 
@@ -349,39 +377,42 @@ async def log_initial_state_to_json():
     # before calling this function. For a robust system, you might wait for
     # a certain number of markets to have bids/asks.
     for canonical_name in sorted(MARKET_MAPPING.keys()): # Sort for consistent output
-        poly_book, kalshi_book = get_paired_books(canonical_name)
-        comparison_data = MARKET_COMPARISON_DATA.get(canonical_name)
+        pair = PAIRS.get(canonical_name) # None once the market has closed
 
         market_entry = {
             "cn_mkt": canonical_name,
-            "pm": process_book_data_for_initial(poly_book),
-            "ks": process_book_data_for_initial(kalshi_book),
-            "cmp": process_comparison_data(comparison_data)
+            "pm": process_book_data_for_initial(pair and pair.poly),
+            "ks": process_book_data_for_initial(pair and pair.kalshi),
+            "cmp": process_comparison_data(pair)
         }
         initial_state_data["markets"].append(market_entry)
 
     try:
-        with open(INITIAL_STATE_FILE_NAME, "w") as f: # Use "w" to overwrite
-            json.dump(initial_state_data, f, indent=2) # Use indent for readability in initial file
+        # Use indent for readability in initial file
+        if orjson is not None:
+            data = orjson.dumps(initial_state_data, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(initial_state_data, indent=2).encode()
+        with open(INITIAL_STATE_FILE_NAME, "wb") as f: # Use "wb" to overwrite
+            f.write(data)
         logger.info(f"Logged initial state to {INITIAL_STATE_FILE_NAME}")
     except Exception as e:
         logger.error(f"Error writing initial state to JSON file: {e}")
 
 
-async def log_order_book_update_to_deltas_json(
+def log_order_book_update_to_deltas_json(
     canonical_name: str, 
     source_platform: str, 
     native_market_id: str, 
     update_payload: Dict[str, Any] # This is the raw message content relevant to the update
 ):
     """
-    Logs an order book update event for a specific market to the deltas JSONL file.
-    Includes the raw update payload and current comparison data.
+    Queues an order book update event for a specific market for delta_writer_task()
+    to append to the deltas JSONL file. Includes the raw update payload, with prices
+    and sizes passed through exactly as received; readers round if they need to.
     """
-    comparison_data = MARKET_COMPARISON_DATA.get(canonical_name)
-
     log_entry = {
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": time.time_ns(), # Integer epoch nanoseconds; readers format it if needed
         "name": canonical_name
     }
 
@@ -392,226 +423,419 @@ async def log_order_book_update_to_deltas_json(
         if event=="price_change":
             log_entry["pm_delta"] = {"changes": update_payload["changes"],
                                      "event_type": "delta",}
+            _apply_poly_changes(native_market_id, update_payload["changes"])
         elif event =="book":
-            log_entry["pm_delta"] = {"changes": {"asks": update_payload["asks"],
-                                                 "bids": update_payload["bids"],},
-                                     "event_type": "book",}
+            diff = _poly_book_diff(native_market_id, update_payload)
+            if diff is None: # First snapshot for this market: log it in full
+                log_entry["pm_delta"] = {"changes": {"asks": update_payload["asks"],
+                                                     "bids": update_payload["bids"],},
+                                         "event_type": "book",}
+            elif diff:
+                # Same change format as price_change (numeric sizes); size 0 removes a level
+                log_entry["pm_delta"] = {"changes": diff,
+                                         "event_type": "diff",}
         else:
-            logger.debug(f"NOVEL MESSAGE POLY")
+            logger.debug("NOVEL MESSAGE POLY")
     elif source_platform == "kalshi":
-        if update_payload.get("price"):
-            log_entry["ks_delta"] = {"price": update_payload.get("price"),
+        if isinstance(update_payload, bytes):
+            # Raw websocket frame: splice it into the line as-is under "ks_frame" (its "msg" is the delta)
+            DELTA_LOG_QUEUE.put_nowait(b'{"ts":%d,"name":%b,"ks_frame":%b}\n' % (
+                log_entry["ts"], _json_name(canonical_name), update_payload))
+            logger.debug("Queued raw Kalshi frame for %s", canonical_name)
+            return
+        price = update_payload.get("price")
+        if price:
+            log_entry["ks_delta"] = {"price": price,
                                      "delta": update_payload.get("delta"),
                                      "side": update_payload.get("side")}
-        elif update_payload.get("yes"):
-            log_entry["ks_delta"] = {"yes": update_payload.get("yes"),
-                                     "no": update_payload.get("no"),}
         else:
-            logger.debug(f"NOVEL MESSAGE KALSHI")
+            yes = update_payload.get("yes")
+            if yes:
+                log_entry["ks_delta"] = {"yes": yes,
+                                         "no": update_payload.get("no"),}
+            else:
+                logger.debug("NOVEL MESSAGE KALSHI")
     elif source_platform == "system_closure":
         # For closures, no delta, just record the event
         pass # No "pm_delta" or "ks_delta" for closure events
 
     if log_entry.get("ks_delta") or log_entry.get("pm_delta"):
-        try:
-            # Open in append mode, write a single JSON line, then a newline
-            # Using separators to remove whitespace for maximum compactness
-            with open(ORDER_BOOK_CHANGES_FILE_NAME, "a") as f:
-                f.write(json.dumps(log_entry, separators=(',', ':')) + "\n")
-            logger.debug(f"Logged delta for {canonical_name} (from {source_platform}) to {ORDER_BOOK_CHANGES_FILE_NAME}")
-        except Exception as e:
-            logger.error(f"Error writing to JSON deltas log file: {e}")
+        DELTA_LOG_QUEUE.put_nowait(log_entry)
+        logger.debug("Queued delta for %s (from %s) for %s", canonical_name, source_platform, ORDER_BOOK_CHANGES_FILE_NAME)
+
 
+_NAME_JSON: Dict[str, bytes] = {} # canonical_name -> its JSON string encoding
 
-async def process_websocket_message(source: str, message: Dict[str, Any], polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+
+def _json_name(canonical_name: str) -> bytes:
+    """Returns canonical_name encoded as a JSON string, cached per name."""
+    encoded = _NAME_JSON.get(canonical_name)
+    if encoded is None:
+        encoded = _NAME_JSON[canonical_name] = _dumps_line(canonical_name)[:-1]
+    return encoded
+
+
+def _apply_poly_changes(asset_id: str, changes: List[Dict[str, Any]]):
+    """Applies a logged price_change to the levels tracked for diffing later "book" snapshots."""
+    levels = _LOGGED_POLY_LEVELS.get(asset_id)
+    if levels is None:
+        return # No snapshot logged yet; the next one is logged in full anyway
+    for change in changes:
+        key = (change["side"], float(change["price"]))
+        size = float(change["size"])
+        if size == 0:
+            levels.pop(key, None)
+        else:
+            levels[key] = (change["price"], size)
+
+
+def _poly_book_diff(asset_id: str, book_event: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
     """
-    Processes a message from the WebSocket queue, updates the relevant order book,
-    performs cross-market comparison if applicable, and logs the state to JSON.
-    Handles market closure/resolution by unsubscribing.
+    Records a Polymarket "book" snapshot as the market's logged levels and returns the
+    price_change-style changes since the previous logged state, or None if this is the
+    market's first snapshot.
     """
-    market_id = None
-    canonical_market_name = None
-    
-    # Store the relevant part of the message to log as a delta
-    update_payload = None 
+    levels = {("BUY", float(level["price"])): (level["price"], float(level["size"])) for level in book_event["bids"]}
+    levels.update({("SELL", float(level["price"])): (level["price"], float(level["size"])) for level in book_event["asks"]})
+    previous = _LOGGED_POLY_LEVELS.get(asset_id)
+    _LOGGED_POLY_LEVELS[asset_id] = levels
+    if previous is None:
+        return None
+    diff = [{"price": price, "side": side, "size": size}
+            for (side, key_price), (price, size) in levels.items()
+            if previous.get((side, key_price), (None, None))[1] != size]
+    diff.extend({"price": price, "side": side, "size": 0.0}
+                for (side, key_price), (price, _) in previous.items() if (side, key_price) not in levels)
+    return diff
+
+
+async def delta_writer_task():
+    """
+    Drains DELTA_LOG_QUEUE into the deltas JSONL file through an MmapAppendLog, so
+    appending a batch of up to DELTA_BATCH_SIZE entries costs no syscalls. Dirty pages
+    are synced from the default executor every DELTA_LOG_SYNC_SECONDS. Anything still
+    queued when the task is cancelled is written before the log is closed.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        delta_log = MmapAppendLog(ORDER_BOOK_CHANGES_FILE_NAME, DELTA_LOG_CHUNK_BYTES)
+    except OSError as e:
+        logger.error(f"Could not open JSON deltas log file {ORDER_BOOK_CHANGES_FILE_NAME}: {e}")
+        raise
+    sync: Optional[asyncio.Future] = None
+    last_sync = time.monotonic()
+    try:
+        while True:
+            batch = [await DELTA_LOG_QUEUE.get()]
+            while len(batch) < DELTA_BATCH_SIZE and not DELTA_LOG_QUEUE.empty():
+                batch.append(DELTA_LOG_QUEUE.get_nowait())
+            for entry in batch: # Entries are dicts, or lines already encoded as bytes
+                delta_log.write(entry if isinstance(entry, bytes) else _dumps_line(entry))
+            now = time.monotonic()
+            if now - last_sync >= DELTA_LOG_SYNC_SECONDS and (sync is None or sync.done()):
+                last_sync = now
+                sync = loop.run_in_executor(None, delta_log.flush)
+    finally:
+        try:
+            if sync is not None and not sync.done():
+                await asyncio.wait([sync]) # The mapping can't be closed mid-msync
+            while not DELTA_LOG_QUEUE.empty():
+                entry = DELTA_LOG_QUEUE.get_nowait()
+                delta_log.write(entry if isinstance(entry, bytes) else _dumps_line(entry))
+        finally:
+            delta_log.close()
 
-    if source == 'polymarket':
-        market_id = message.get("asset_id")
-        if not market_id:
-            logger.warning(f"Polymarket message missing 'asset_id'. Message: {message}")
-            return
-        
-        canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
-        if not canonical_market_name:
-            logger.warning(f"Polymarket message for unmapped market_id: {market_id}. Message: {message}")
-            return
-        
-        order_book = ALL_ORDER_BOOKS.get(market_id)
-        if order_book:
-            # Assume update_polymarket_order_book consumes the relevant message part
-            # and that 'message' itself contains the delta info
-            update_polymarket_order_book(order_book, message)
-            update_payload = message # Log the raw Polymarket message
-            logger.debug(f"Polymarket book for {market_id} updated.")
-        else:
-            logger.error(f"OrderBook instance not found for Polymarket market_id: {market_id}. Perhaps it was already closed/unsubscribed.")
-            return
 
-    elif source == 'kalshi':
-        msg_content = message.get("msg", {})
-        market_id = msg_content.get("market_ticker")
-        
-        if not market_id:
-            logger.warning(f"Kalshi message missing 'market_ticker'. Message: {message}")
-            return
-        
-        canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
-        if not canonical_market_name:
-            logger.warning(f"Kalshi message for unmapped market_id: {market_id}")
-            return
-        
-        order_book = ALL_ORDER_BOOKS.get(market_id)
-        if order_book:
-            update_kalshi_order_book(order_book, message)
-            # For Kalshi, the 'msg' part usually contains the event details, not the top-level message.
-            update_payload = message.get("msg", message) # Log the relevant Kalshi message part
-            logger.debug(f"Kalshi book for {market_id} updated.")
-        else:
-            logger.error(f"OrderBook instance not found for Kalshi market_id: {market_id}.")
-            return
-    
-    elif source == "update": # This source is specifically for Kalshi market status updates
-        msg_content = message.get("msg", {})
-        market_id = msg_content.get("market_ticker")
-        
-        result_true = ("result" in msg_content and msg_content["result"] is not None)
-        closed_true = msg_content.get("is_deactivated", False)
+async def _handle_polymarket_message(message: Dict[str, Any], polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+    """Applies a Polymarket book/price_change event. Returns (MARKET_INDEX entry, market_id, platform, payload) or None."""
+    try:
+        market_id = message["asset_id"]
+    except KeyError:
+        logger.warning(f"Polymarket message missing 'asset_id'. Message: {message}")
+        return None
 
-        if market_id and (result_true or closed_true):
-            canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
-            if not canonical_market_name:
-                logger.warning(f"Kalshi 'update' message for unmapped market_id: {market_id}. Skipping unsubscribe.")
-                return
+    entry = MARKET_INDEX.get(market_id)
+    if not entry:
+        logger.warning(f"Polymarket message for unmapped or closed market_id: {market_id}. Message: {message}")
+        return None
 
-            logger.info(f"Market {canonical_market_name} (Kalshi: {market_id}) resolved (Result: {msg_content.get('result')}) or closed (Deactivated: {msg_content.get('is_deactivated')}). Attempting to unsubscribe from both platforms.")
+    # Assume update_polymarket_order_book consumes the relevant message part
+    # and that 'message' itself contains the delta info
+    update_polymarket_order_book(entry[1], message)
+    logger.debug("Polymarket book for %s updated.", market_id)
+    return entry, market_id, "polymarket", message # Log the raw Polymarket message
 
-            polymarket_id_for_canonical = MARKET_MAPPING.get(canonical_market_name, {}).get("polymarket")
 
-            if market_id in kalshi_wss.ticker_list: 
-                await kalshi_wss.unsubscribe(market_id)
-                logger.info(f"Successfully unsubscribed from Kalshi market: {market_id}")
-            else:
-                logger.debug(f"Kalshi market {market_id} was not in active subscription list for KalshiWSS, skipping unsubscribe via WSS object.")
+async def _handle_kalshi_message(message: Dict[str, Any], polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+    """Applies a Kalshi orderbook snapshot/delta. Returns (MARKET_INDEX entry, market_id, platform, payload) or None."""
+    try:
+        msg_content = message["msg"]
+        market_id = msg_content["market_ticker"]
+    except (KeyError, TypeError): # TypeError: "msg" is null
+        logger.warning(f"Kalshi message missing 'market_ticker'. Message: {message}")
+        return None
+
+    entry = MARKET_INDEX.get(market_id)
+    if not entry:
+        logger.warning(f"Kalshi message for unmapped or closed market_id: {market_id}")
+        return None
+
+    update_kalshi_order_book(entry[1], message)
+    logger.debug("Kalshi book for %s updated.", market_id)
+    # For Kalshi, the 'msg' part usually contains the event details, not the top-level message.
+    # If the client kept the raw frame, log that instead so it needn't be re-encoded.
+    return entry, market_id, "kalshi", message.get(RAW_FRAME_KEY, msg_content)
+
+
+async def _handle_kalshi_update_message(message: Dict[str, Any], polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+    """Handles Kalshi market lifecycle updates, unsubscribing from resolved/closed markets. Always returns None."""
+    msg_content = message.get("msg")
+    if msg_content is None:
+        logger.debug("Kalshi 'update' message without 'msg': %s", message)
+        return None
+    market_id = msg_content.get("market_ticker")
+
+    result_true = msg_content.get("result") is not None
+    closed_true = msg_content.get("is_deactivated", False)
+
+    if not (market_id and (result_true or closed_true)):
+        logger.debug("Kalshi 'update' message received (not resolved/closed): %s", message)
+        return None
+
+    canonical_market_name = REVERSE_MARKET_LOOKUP.get(market_id)
+    if not canonical_market_name:
+        logger.warning(f"Kalshi 'update' message for unmapped market_id: {market_id}. Skipping unsubscribe.")
+        return None
+
+    logger.info(f"Market {canonical_market_name} (Kalshi: {market_id}) resolved (Result: {msg_content.get('result')}) or closed (Deactivated: {msg_content.get('is_deactivated')}). Attempting to unsubscribe from both platforms.")
+
+    polymarket_id_for_canonical = MARKET_MAPPING.get(canonical_market_name, {}).get("polymarket")
+
+    if market_id in kalshi_wss.ticker_list: 
+        await kalshi_wss.unsubscribe(market_id)
+        logger.info(f"Successfully unsubscribed from Kalshi market: {market_id}")
+    else:
+        logger.debug("Kalshi market %s was not in active subscription list for KalshiWSS, skipping unsubscribe via WSS object.", market_id)
 
-            if polymarket_id_for_canonical and polymarket_id_for_canonical in polymarket_wss.asset_ids: 
-                await polymarket_wss.unsubscribe(polymarket_id_for_canonical)
-                logger.info(f"Successfully unsubscribed from Polymarket market: {polymarket_id_for_canonical} (corresponding to {canonical_market_name})")
-            elif polymarket_id_for_canonical:
-                logger.debug(f"Polymarket market {polymarket_id_for_canonical} was not in active subscription list for PolymarketWSS, skipping unsubscribe via WSS object.")
-            else:
-                logger.debug(f"No corresponding Polymarket market found for {canonical_market_name} in mapping, skipping Polymarket unsubscribe.")
-            
-            # Clean up global data structures
-            if market_id in ALL_ORDER_BOOKS: del ALL_ORDER_BOOKS[market_id]
-            if market_id in REVERSE_MARKET_LOOKUP: del REVERSE_MARKET_LOOKUP[market_id]
-            if polymarket_id_for_canonical and polymarket_id_for_canonical in ALL_ORDER_BOOKS: del ALL_ORDER_BOOKS[polymarket_id_for_canonical]
-            if polymarket_id_for_canonical and polymarket_id_for_canonical in REVERSE_MARKET_LOOKUP: del REVERSE_MARKET_LOOKUP[polymarket_id_for_canonical]
-            if canonical_market_name in MARKET_COMPARISON_DATA: del MARKET_COMPARISON_DATA[canonical_market_name]
-                
-            # Log this market closure/resolution event without an update_payload
-            await log_order_book_update_to_deltas_json(canonical_market_name, "system_closure", market_id, {}) 
-
-            return 
-        else:
-            logger.debug(f"Kalshi 'update' message received (not resolved/closed): {message}")
-            return
+    if polymarket_id_for_canonical and polymarket_id_for_canonical in polymarket_wss.asset_ids: 
+        await polymarket_wss.unsubscribe(polymarket_id_for_canonical)
+        logger.info(f"Successfully unsubscribed from Polymarket market: {polymarket_id_for_canonical} (corresponding to {canonical_market_name})")
+    elif polymarket_id_for_canonical:
+        logger.debug("Polymarket market %s was not in active subscription list for PolymarketWSS, skipping unsubscribe via WSS object.", polymarket_id_for_canonical)
     else:
+        logger.debug("No corresponding Polymarket market found for %s in mapping, skipping Polymarket unsubscribe.", canonical_market_name)
+    
+    # Clean up global data structures
+    MARKET_INDEX.pop(market_id, None)
+    if polymarket_id_for_canonical: MARKET_INDEX.pop(polymarket_id_for_canonical, None)
+    if polymarket_id_for_canonical: _LOGGED_POLY_LEVELS.pop(polymarket_id_for_canonical, None)
+    if market_id in ALL_ORDER_BOOKS: del ALL_ORDER_BOOKS[market_id]
+    if market_id in REVERSE_MARKET_LOOKUP: del REVERSE_MARKET_LOOKUP[market_id]
+    if polymarket_id_for_canonical and polymarket_id_for_canonical in ALL_ORDER_BOOKS: del ALL_ORDER_BOOKS[polymarket_id_for_canonical]
+    if polymarket_id_for_canonical and polymarket_id_for_canonical in REVERSE_MARKET_LOOKUP: del REVERSE_MARKET_LOOKUP[polymarket_id_for_canonical]
+    PAIRS.pop(canonical_market_name, None)
+        
+    # Log this market closure/resolution event without an update_payload
+    log_order_book_update_to_deltas_json(canonical_market_name, "system_closure", market_id, {}) 
+    return None
+
+
+# Indexed by the integer source tag each WSS client stamps on the messages it enqueues.
+MESSAGE_HANDLERS = (
+    _handle_polymarket_message,     # SOURCE_POLYMARKET
+    _handle_kalshi_message,         # SOURCE_KALSHI
+    _handle_kalshi_update_message,  # SOURCE_KALSHI_UPDATE
+)
+
+
+def _mark_market_dirty(canonical_name: str, pair: MarketPair):
+    """
+    Queues a comparison for canonical_name at the end of the current event loop pass,
+    so a burst of updates to the same market is compared only once.
+    """
+    global _dirty_flush_handle
+    DIRTY_MARKETS[canonical_name] = pair
+    if _dirty_flush_handle is None:
+        _dirty_flush_handle = asyncio.get_running_loop().call_soon(_flush_dirty_markets)
+
+
+def _flush_dirty_markets():
+    """Runs perform_cross_market_comparison once for every market marked dirty."""
+    global _dirty_flush_handle
+    _dirty_flush_handle = None
+    dirty = list(DIRTY_MARKETS.items())
+    DIRTY_MARKETS.clear()
+    for canonical_name, pair in dirty:
+        if canonical_name not in PAIRS:
+            continue # Closed since it was marked
+        logger.debug("Performing cross-market comparison for %s", canonical_name)
+        perform_cross_market_comparison(canonical_name, pair)
+
+
+async def process_websocket_message(source: int, message: Dict[str, Any], polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+    """
+    Processes a message from the WebSocket queue, updates the relevant order book,
+    schedules a cross-market comparison if applicable, and logs the update to JSON.
+    Handles market closure/resolution by unsubscribing.
+    """
+    try:
+        handler = MESSAGE_HANDLERS[source]
+    except (IndexError, TypeError):
         logger.warning(f"Unknown message source: {source}")
         return
 
-    # After an order book was updated by a relevant message, perform comparison and log the raw message
-    if update_payload is not None and canonical_market_name and canonical_market_name in MARKET_COMPARISON_DATA:
-        logger.debug(f"Performing cross-market comparison for {canonical_market_name}")
-        perform_cross_market_comparison(canonical_market_name)
-        await log_order_book_update_to_deltas_json(canonical_market_name, source, market_id, update_payload)
+    result = await handler(message, polymarket_wss, kalshi_wss)
+    if result is None:
+        return
+    (canonical_market_name, _, pair), market_id, platform, update_payload = result
+
+    # After an order book was updated by a relevant message, schedule its comparison and log the raw message
+    _mark_market_dirty(canonical_market_name, pair)
+    log_order_book_update_to_deltas_json(canonical_market_name, platform, market_id, update_payload)
+
+
+# Per-source native market id getters from the WSS layer, indexed like MESSAGE_HANDLERS.
+# Used to pick a message's worker without branching on its source.
+MARKET_ID_GETTERS = (
+    polymarket_market_id,  # SOURCE_POLYMARKET
+    kalshi_market_id,      # SOURCE_KALSHI
+    kalshi_market_id,      # SOURCE_KALSHI_UPDATE
+)
+
+
+class DequeMessageQueue:
+    """
+    The put()/get() subset of asyncio.Queue that the WSS clients and message_consumer() use,
+    built on a deque plus a single Future the consumer parks on while the deque is empty.
+    A put is an append and, only if the consumer is waiting, one set_result(); there are no
+    per-item getter Futures and no unfinished-task bookkeeping.
+    With a maxsize, put() waits while the queue is full (backpressure on the producers);
+    put_nowait() always appends.
+    """
+    __slots__ = ("_items", "_maxsize", "_waker", "_space")
+
+    def __init__(self, maxsize: int = 0):
+        self._items = collections.deque()
+        self._maxsize = maxsize # 0 means unbounded, as with asyncio.Queue
+        self._waker: Optional[asyncio.Future] = None
+        self._space: Optional[asyncio.Future] = None # Shared by every producer waiting in put()
+
+    def put_nowait(self, item: Any):
+        self._items.append(item)
+        waker = self._waker
+        if waker is not None and not waker.done():
+            waker.set_result(None)
+
+    async def put(self, item: Any):
+        while self._maxsize and len(self._items) >= self._maxsize:
+            if self._space is None or self._space.done():
+                self._space = asyncio.get_running_loop().create_future()
+            await self._space
+        self.put_nowait(item)
+
+    def _wake_producers(self):
+        space = self._space
+        if space is not None and not space.done():
+            space.set_result(None)
+
+    async def _wait_for_items(self):
+        while not self._items:
+            self._waker = asyncio.get_running_loop().create_future()
+            await self._waker
+
+    async def get(self) -> Any:
+        await self._wait_for_items()
+        item = self._items.popleft()
+        self._wake_producers()
+        return item
+
+    async def get_all(self) -> List[Any]:
+        """Waits until at least one item is queued, then removes and returns every queued item."""
+        await self._wait_for_items()
+        batch = list(self._items)
+        self._items.clear()
+        self._wake_producers()
+        return batch
+
+
+async def message_worker(worker_queue: DequeMessageQueue, polymarket_wss: PolymarketWSS, kalshi_wss: KalshiWSS):
+    """Processes messages from one worker shard in arrival order."""
+    while True:
+        source, message = await worker_queue.get()
+        try:
+            await process_websocket_message(source, message, polymarket_wss, kalshi_wss)
+        except Exception as e:
+            logger.error(f"Error processing message from {source}: {e}", exc_info=True)
+
+
+def _write_book_summary(buf: io.StringIO, platform: str, book: Optional[OrderBook]):
+    """Writes one platform's best bid/ask and spread lines for the periodic snapshot."""
+    if not book:
+        buf.write(f"  {platform}: N/A (Order Book not available)\n")
+        return
+    highest_bid, lowest_ask, spread = book.highest_bid, book.lowest_ask, book.bid_ask_spread
+    buf.write(f"  {platform}:\n")
+    buf.write(f"    Bid: {highest_bid:.4f}\n" if highest_bid is not None else "    Bid: N/A\n")
+    buf.write(f"    Ask: {lowest_ask:.4f}\n" if lowest_ask is not None else "    Ask: N/A\n")
+    buf.write(f"    Spread: {spread:.4f}\n" if spread is not None else "    Spread: N/A\n")
 
 
 async def print_prices_periodically():
     """Periodically prints the current best bid and ask for each platform and market,
-       and checks for cross-outcome arbitrage opportunities. This function *only prints*."""
+       and checks for cross-outcome arbitrage opportunities. This function *only prints*.
+       The per-market snapshot is built in one buffer and emitted as a single log record."""
     while True:
         await asyncio.sleep(PRINT_INTERVAL_SECONDS)
-        logger.info(f"\n--- Current Market Snapshot ({datetime.now().strftime('%H:%M:%S')}) ---")
+        buf = io.StringIO()
+        buf.write(f"\n--- Current Market Snapshot ({datetime.now().strftime('%H:%M:%S')}) ---\n")
 
         # --- Print Same-Outcome Best Prices and Arb ---
-        for canonical_name in list(MARKET_COMPARISON_DATA.keys()): 
-            if canonical_name not in MARKET_COMPARISON_DATA:
-                continue
-
-            comparison_data = MARKET_COMPARISON_DATA[canonical_name]
-            logger.info(f"\nMarket: {canonical_name}")
-
-            poly_book, kalshi_book = get_paired_books(canonical_name)
-
-            if poly_book:
-                poly_highest_bid = poly_book.highest_bid
-                poly_lowest_ask = poly_book.lowest_ask
-                logger.info(f"  Polymarket:")
-                logger.info(f"    Bid: {poly_highest_bid:.4f}" if poly_highest_bid is not None else "    Bid: N/A")
-                logger.info(f"    Ask: {poly_lowest_ask:.4f}" if poly_lowest_ask is not None else "    Ask: N/A")
-                logger.info(f"    Spread: {poly_book.bid_ask_spread:.4f}" if poly_book.bid_ask_spread is not None else "    Spread: N/A")
-            else:
-                logger.info(f"  Polymarket: N/A (Order Book not available)")
-
-            if kalshi_book:
-                kalshi_highest_bid = kalshi_book.highest_bid
-                kalshi_lowest_ask = kalshi_book.lowest_ask
-                logger.info(f"  Kalshi:")
-                logger.info(f"    Bid: {kalshi_highest_bid:.4f}" if kalshi_highest_bid is not None else "    Bid: N/A")
-                logger.info(f"    Ask: {kalshi_lowest_ask:.4f}" if kalshi_lowest_ask is not None else "    Ask: N/A")
-                logger.info(f"    Spread: {kalshi_book.bid_ask_spread:.4f}" if kalshi_book.bid_ask_spread is not None else "    Spread: N/A")
-            else:
-                logger.info(f"  Kalshi: N/A (Order Book not available)")
-            
-            global_buy_platform = comparison_data['cheapest_buy_yes']['platform'] or 'N/A'
-            global_buy_price = comparison_data['cheapest_buy_yes']['price'] 
+        for canonical_name, pair in PAIRS.items():
+            buf.write(f"\nMarket: {canonical_name}\n")
+            _write_book_summary(buf, "Polymarket", pair.poly)
+            _write_book_summary(buf, "Kalshi", pair.kalshi)
+
+            global_buy_platform, global_buy_price, global_sell_platform, global_sell_price, \
+                arb_liquidity = _compare_pair(pair)
+            global_buy_platform = global_buy_platform or 'N/A'
             global_buy_price_str = f"{global_buy_price:.4f}" if global_buy_price != float('inf') else 'N/A'
             
-            global_sell_platform = comparison_data['highest_sell_yes']['platform'] or 'N/A'
-            global_sell_price = comparison_data['highest_sell_yes']['price']
+            global_sell_platform = global_sell_platform or 'N/A'
             global_sell_price_str = f"{global_sell_price:.4f}" if global_sell_price != 0.0 else 'N/A'
 
-            logger.info(f"  --- Cross-Platform Same-Outcome Best ---")
-            logger.info(f"    Cheapest Buy 'Yes': {global_buy_platform} @ {global_buy_price_str}")
-            logger.info(f"    Highest Sell 'Yes': {global_sell_platform} @ {global_sell_price_str}")
-            
-            arb_liquidity = comparison_data.get('same_outcome_arbitrage_liquidity', 0.0)
+            buf.write("  --- Cross-Platform Same-Outcome Best ---\n")
+            buf.write(f"    Cheapest Buy 'Yes': {global_buy_platform} @ {global_buy_price_str}\n")
+            buf.write(f"    Highest Sell 'Yes': {global_sell_platform} @ {global_sell_price_str}\n")
+
             if arb_liquidity > 0:
-                logger.info(f"    Arbitrage Liquidity: {arb_liquidity:.2f} shares")
-        
-        logger.info("\n--- Checking Cross-Outcome Arbitrage Opportunities ---")
-        for market_a_name, market_b_name in COMPLEMENTARY_MARKET_PAIRS.items():
-            if market_a_name in MARKET_MAPPING and market_b_name in MARKET_MAPPING and \
-               market_a_name in MARKET_COMPARISON_DATA and market_b_name in MARKET_COMPARISON_DATA:
-                if market_a_name < market_b_name:
-                    find_cross_outcome_arbitrage(market_a_name, market_b_name)
-            else:
-                logger.debug(f"Skipping cross-outcome check for {market_a_name} <-> {market_b_name} as one or both not fully mapped or actively tracked.")
+                buf.write(f"    Arbitrage Liquidity: {arb_liquidity:.2f} shares\n")
+
+        buf.write("\n--- Checking Cross-Outcome Arbitrage Opportunities ---")
+        logger.info(buf.getvalue())
+        for arb_task in _ARB_TASKS:
+            arb_task()
 
         logger.info("\n" + "=" * 80 + "\n")
 
 
+class _RunComplete(Exception):
+    """Raised inside main()'s TaskGroup once RUN_DURATION_MINUTES is up, to stop every task."""
+
+
 async def main():
-    message_queue = asyncio.Queue()
+    # Python 3.12+: new tasks run synchronously up to their first real await instead of
+    # waiting a loop iteration to start (older versions keep the default factory)
+    eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_task_factory is not None:
+        asyncio.get_running_loop().set_task_factory(eager_task_factory)
+
+    message_queue = DequeMessageQueue(maxsize=MESSAGE_QUEUE_MAXSIZE)
 
     await initialize_market_data()
 
-    poly_asset_ids_to_subscribe = list(set([
-        market_ids["polymarket"] for market_ids in MARKET_MAPPING.values() if "polymarket" in market_ids
-    ]))
-    kalshi_tickers_to_subscribe = list(set([
-        market_ids["kalshi"] for market_ids in MARKET_MAPPING.values() if "kalshi" in market_ids
-    ]))
+    # Fresh lists: the WSS clients remove ids from them as markets close
+    poly_asset_ids_to_subscribe = list(POLY_ASSET_IDS)
+    kalshi_tickers_to_subscribe = list(KALSHI_TICKERS)
     
     if not poly_asset_ids_to_subscribe and not kalshi_tickers_to_subscribe:
         logger.critical("No markets found in MARKET_MAPPING to subscribe to. Exiting.")
@@ -628,56 +852,62 @@ async def main():
         private_key=private_key,
         environment=env,
         message_queue=message_queue,
-        ticker_list=kalshi_tickers_to_subscribe
+        ticker_list=kalshi_tickers_to_subscribe,
+        keep_raw_frames=True # Lets the deltas log copy Kalshi frames verbatim
     )
     
     await kalshi_wss.connect()
     await polymarket_wss.connect()
 
     if kalshi_wss.ws or polymarket_wss.websocket:
-        tasks = []
-        if kalshi_wss.ws:
-            tasks.append(asyncio.create_task(kalshi_wss.listen()))
-        else:
-            logger.warning("Kalshi WebSocket connection not established.")
-        if polymarket_wss.websocket:
-            tasks.append(asyncio.create_task(polymarket_wss.listen()))
-        else:
-            logger.warning("Polymarket WebSocket connection not established.")
+        # A fixed pool of workers; every message for a given market lands on the same
+        # worker, so per-market ordering is preserved while different markets run concurrently.
+        # Bounded too, so a slow worker stalls the consumer, which in turn stalls the WSS
+        # listeners once message_queue fills, instead of buffering without limit
+        worker_queues = [DequeMessageQueue(maxsize=WORKER_QUEUE_MAXSIZE) for _ in range(NUM_MESSAGE_WORKERS)]
 
-        async def message_consumer(pm_wss: PolymarketWSS, k_wss: KalshiWSS):
-            # Give a small delay to allow initial messages to populate some order books
-            # This is not guaranteed, but gives a better chance for initial state.
-            await asyncio.sleep(5) 
-            # Log the initial state *after* connections are established and some data might have flowed
+        async def message_consumer():
             while True:
-                source, message = await message_queue.get()
-                logger.debug(f"\n--- Main received message from {source} ---")
-                asyncio.create_task(process_websocket_message(source, message, pm_wss, k_wss))
-                message_queue.task_done()
-
-        consumer_task = asyncio.create_task(message_consumer(polymarket_wss, kalshi_wss))
-        tasks.append(consumer_task)
-        
-        printer_task = asyncio.create_task(print_prices_periodically())
-        tasks.append(printer_task)
-
-        logger.info(f"WebSocket listeners started. Running for {RUN_DURATION_MINUTES} minutes...")
+                # Route everything that arrived since the last wakeup in one pass
+                for source, message in await message_queue.get_all():
+                    logger.debug("\n--- Main received message from %s ---", source)
+                    try:
+                        shard = hash(MARKET_ID_GETTERS[source](message)) % NUM_MESSAGE_WORKERS
+                    except Exception as e:
+                        # A malformed message must not take down the TaskGroup; drop it
+                        logger.error(f"Dropping message from {source} with no readable market id: {e}")
+                        continue
+                    await worker_queues[shard].put((source, message))
+
+        # Every task lives in one TaskGroup: leaving it (run duration reached, Ctrl+C, or a
+        # task failing) cancels the rest and waits for them before the sockets are closed.
         try:
-            if RUN_DURATION_MINUTES is not None:
-                await asyncio.sleep(RUN_DURATION_MINUTES * 60)
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    if kalshi_wss.ws:
+                        tg.create_task(kalshi_wss.listen())
+                    else:
+                        logger.warning("Kalshi WebSocket connection not established.")
+                    if polymarket_wss.websocket:
+                        tg.create_task(polymarket_wss.listen())
+                    else:
+                        logger.warning("Polymarket WebSocket connection not established.")
+                    for worker_queue in worker_queues:
+                        tg.create_task(message_worker(worker_queue, polymarket_wss, kalshi_wss))
+                    tg.create_task(delta_writer_task())
+                    tg.create_task(message_consumer())
+                    tg.create_task(print_prices_periodically())
+
+                    logger.info(f"WebSocket listeners started. Running for {RUN_DURATION_MINUTES} minutes...")
+                    if RUN_DURATION_MINUTES is not None: # Otherwise run until cancelled
+                        await asyncio.sleep(RUN_DURATION_MINUTES * 60)
+                        raise _RunComplete
+            except* _RunComplete:
                 logger.info(f"Run duration of {RUN_DURATION_MINUTES} minutes completed.")
-            else:
-                await asyncio.Future() # Run indefinitely
         except asyncio.CancelledError:
             logger.info("Program cancelled (e.g., Ctrl+C detected or explicit stop).")
         finally:
             logger.info("Shutting down...")
-            for task in tasks:
-                task.cancel()
-            
-            await asyncio.gather(*tasks, return_exceptions=True)
-            
             if kalshi_wss.ws:
                 await kalshi_wss.disconnect()
             if polymarket_wss.websocket:
@@ -692,15 +922,17 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        # Remove old JSON log files to start fresh
+        # Truncate old JSON log files to start fresh (cheaper than unlinking a multi-GB file,
+        # and creates them if missing)
         for filename in [INITIAL_STATE_FILE_NAME, ORDER_BOOK_CHANGES_FILE_NAME]:
             try:
-                if os.path.exists(filename):
-                    os.remove(filename)
-                    logger.info(f"Removed old {filename} to start fresh.")
+                open(filename, "wb").close()
+                logger.info(f"Truncated {filename} to start fresh.")
             except Exception as e:
-                logger.warning(f"Could not remove old file {filename}: {e}")
+                logger.warning(f"Could not truncate old file {filename}: {e}")
 
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Program manually interrupted (Ctrl+C). Check JSON log files for data.")
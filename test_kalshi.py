@@ -1,8 +1,26 @@
 import asyncio
+import json
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib encoder if orjson isn't installed
+    orjson = None
+try:
+    import uvloop # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 from kalshi.wss import KalshiWSS,  env, KEYID, private_key
-import pprint as pp
 
 TICKERS= ['KXMLBGAME-25JUL03SFARI-ARI']
+OUTPUT_FILE_NAME = "jsons/test_kalshi_messages.jsonl" # Every received message, one JSON line each
+FLUSH_EVERY = 256 # Messages between explicit flushes of the buffered output file
+
+def _dumps_line(obj) -> bytes:
+    """Serializes obj to a compact, newline-terminated JSON line as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, separators=(',', ':')) + "\n").encode()
+
 
 async def main():
     message_queue = asyncio.Queue()
@@ -15,15 +33,18 @@ async def main():
     if kalshi_wss.ws:
         # Start listening in the background only if connection was successful
         asyncio.create_task(kalshi_wss.listen())
-        a=0
-        print("Polymarket listener started. Waiting for messages... (Press Ctrl+C to stop)")
-        while True:
-            # Get messages from the queue (this simulates the main processor)
-            source, message = await message_queue.get()
-            print(f"\n--- Main received from {source} ---")
-            if a<5:
-                pp.pprint(message)
-                a+=1
+        print(f"Kalshi listener started. Writing messages to {OUTPUT_FILE_NAME}... (Press Ctrl+C to stop)")
+        # Messages are appended to a buffered file rather than printed, so console IO
+        # doesn't hold up the loop and skew what's being measured
+        with open(OUTPUT_FILE_NAME, "wb") as out:
+            received = 0
+            while True:
+                # Get messages from the queue (this simulates the main processor)
+                source, message = await message_queue.get()
+                out.write(_dumps_line({"src": source, "msg": message}))
+                received += 1
+                if received % FLUSH_EVERY == 0:
+                    out.flush()
     else:
         print("Could not start listener, connection to WebSocket failed.")
 
@@ -31,6 +52,8 @@ async def main():
 if __name__ == "__main__":
     try:
         print('loooooooool')
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\nProgram interrupted. Shutting down.")
@@ -0,0 +1,23 @@
+from order_book import OrderBook
+
+
+def _book_with_asks(prices):
+    book = OrderBook("test")
+    for price in prices:
+        book._update_book_level('ask', price, 1.0)
+    return book
+
+
+def test_level_at_exactly_the_limit_is_not_arbitrage_depth():
+    # 0.01 + 0.98 == 0.99 in float; 0.99 - 0.98 rounds above 0.01, so the old rearranged
+    # threshold counted this break-even level
+    book = _book_with_asks([0.01])
+    assert book.ask_depth_below_combined(0.98, 1.0 - 0.01) == 0.0
+
+
+def test_matches_level_by_level_sum_for_all_cent_prices():
+    cents = [c / 100 for c in range(1, 99)]
+    book = _book_with_asks(cents)
+    for other in cents:
+        expected = sum(1.0 for price in cents if price + other < 1.0 - 0.01)
+        assert book.ask_depth_below_combined(other, 1.0 - 0.01) == expected, other
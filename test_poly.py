@@ -1,11 +1,29 @@
 import asyncio
-import pprint
+import json
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib encoder if orjson isn't installed
+    orjson = None
+try:
+    import uvloop # libuv-based event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
 from polymarket.wss import PolymarketWSS, POLYMARKET_MARKET_WSS_URI
 
 
 # Example Asset ID (Token ID) from the documentation.
 # You can add more asset IDs here in a list: ["ID1", "ID2", "ID3"]
 MARKET_ASSET_IDS = ["5986371862208839175485490179523653880632219954307111830409221264009788091256"]
+OUTPUT_FILE_NAME = "jsons/test_poly_messages.jsonl" # Every received message, one JSON line each
+FLUSH_EVERY = 256 # Messages between explicit flushes of the buffered output file
+
+def _dumps_line(obj) -> bytes:
+    """Serializes obj to a compact, newline-terminated JSON line as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, separators=(',', ':')) + "\n").encode()
+
 
 async def main():
     message_queue = asyncio.Queue()
@@ -17,12 +35,18 @@ async def main():
         # Start listening in the background only if connection was successful
         asyncio.create_task(polymarket_wss.listen())
 
-        print("Polymarket listener started. Waiting for messages... (Press Ctrl+C to stop)")
-        while True:
-            # Get messages from the queue (this simulates the main processor)
-            source, message = await message_queue.get()
-            print(f"\n--- Main received from {source} ---")
-            pprint.pprint(message)
+        print(f"Polymarket listener started. Writing messages to {OUTPUT_FILE_NAME}... (Press Ctrl+C to stop)")
+        # Messages are appended to a buffered file rather than printed, so console IO
+        # doesn't hold up the loop and skew what's being measured
+        with open(OUTPUT_FILE_NAME, "wb") as out:
+            received = 0
+            while True:
+                # Get messages from the queue (this simulates the main processor)
+                source, message = await message_queue.get()
+                out.write(_dumps_line({"src": source, "msg": message}))
+                received += 1
+                if received % FLUSH_EVERY == 0:
+                    out.flush()
     else:
         print("Could not start listener, connection to WebSocket failed.")
 
@@ -30,6 +54,8 @@ async def main():
 if __name__ == "__main__":
     try:
         print('loooooooool')
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         asyncio.run(main())
     except KeyboardInterrupt:
         print("\nProgram interrupted. Shutting down.")
\ No newline at end of file
@@ -1,10 +1,10 @@
 # --- START OF FILE trader.py (CORRECTED) ---
 
 import asyncio
+import itertools
 import logging
 import time
 from typing import Optional, Any, Dict
-import os
 import pprint as pp
 
 # Import client libraries and types
@@ -12,10 +12,17 @@ from kalshi.clients import KalshiHttpClient
 from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import OrderArgs, OrderType
 from py_clob_client.order_builder.constants import BUY, SELL
+from py_clob_client.exceptions import PolyApiException
+from clob_client_pool import refresh_creds
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Fields shared by every Kalshi order body; execute_kalshi_trade copies it and fills in the rest
+_KALSHI_BODY_TEMPLATE = {"type": "limit"}
+# Appended to client_order_id so orders placed within the same nanosecond tick stay distinct
+_KALSHI_ORDER_SEQ = itertools.count()
+
 # --- Base Trade Execution Functions ---
 
 async def execute_polymarket_trade(
@@ -40,10 +47,19 @@ async def execute_polymarket_trade(
     
         order_args = OrderArgs(side=side, token_id=market_id, price=price+0.01, size=float(size))
         logger.info(f"Creating Polymarket order: {side} {size} of {market_id} @ {price}")
-        signed_order = client.create_order(order_args)
+        # The client's signing and HTTP calls block, so they run in a worker thread
+        signed_order = await asyncio.to_thread(client.create_order, order_args)
         
         logger.info(f"Posting Polymarket order")
-        response = client.post_order(signed_order, order_type)
+        try:
+            response = await asyncio.to_thread(client.post_order, signed_order, order_type)
+        except PolyApiException as e:
+            if e.status_code != 401:
+                raise
+            # Rejected before it was placed, so re-posting can't double the order
+            logger.warning("Polymarket rejected the API creds; re-deriving them and retrying once")
+            await asyncio.to_thread(refresh_creds, client)
+            response = await asyncio.to_thread(client.post_order, signed_order, order_type)
         logger.info(f"Polymarket Response: {response}")
 
         if response and response.get("success"):
@@ -55,11 +71,6 @@ async def execute_polymarket_trade(
     except Exception as e:
         logger.error(f"An error occurred during the Polymarket transaction: {e}", exc_info=True)
         return None
-    finally:
-        if 'HTTP_PROXY' in os.environ:
-            del os.environ['HTTP_PROXY']
-        if 'HTTPS_PROXY' in os.environ:
-            del os.environ['HTTPS_PROXY']
 
 
 async def execute_kalshi_trade(
@@ -83,14 +94,10 @@ async def execute_kalshi_trade(
     """
     try:
         limit_price_cents = int(price * 100)
+        now_ns = time.time_ns()
         
-        body = {
-            "action": action,
-            "client_order_id": f"comp-arb-{int(time.time())}",
-            "count": count,
-            "ticker": ticker,
-            "type": 'limit',
-        }
+        body = _KALSHI_BODY_TEMPLATE.copy()
+        body.update(action=action, client_order_id=f"comp-arb-{now_ns}-{next(_KALSHI_ORDER_SEQ)}", count=count, ticker=ticker)
         
         # In Kalshi's API, you specify 'yes' or 'no' by which price field you set.
         if is_yes:
@@ -105,11 +112,11 @@ async def execute_kalshi_trade(
         else:
             # For reversal (sell) orders, we can use a standard limit order that expires quickly
             # to avoid it sitting on the books if not filled immediately.
-            body["expiration_ts"] = int(time.time() + 120) # 2 minute expiration
+            body["expiration_ts"] = now_ns // 1_000_000_000 + 120 # 2 minute expiration
 
         logger.info(f"Posting Kalshi order: {body}")
         path = "/trade-api/v2/portfolio/orders"
-        response = client.post(path=path, body=body)
+        response = await asyncio.to_thread(client.post, path=path, body=body) # Blocking request + rate-limit sleep
         logger.info(f"Kalshi Response: {response}")
 
         # A successful order submission returns a response with an 'order' key.
@@ -124,16 +131,13 @@ async def execute_kalshi_trade(
         return None
 
 
-async def blank():
-    pass
-
 async def find_polymarket_trade(
     client: ClobClient, order_id: str, proxies: dict
 ) -> Optional[Dict[str, Any]]:
 
     try:
     
-        order = client.get_order(order_id)
+        order = await asyncio.to_thread(client.get_order, order_id)
         print('ORDER FIND: ')
         pp.pprint(order)
         return order
@@ -141,21 +145,22 @@ async def find_polymarket_trade(
     except Exception as e:
         logger.error(f"An error occurred during the Polymarket transaction: {e}", exc_info=True)
         return None
-    finally:
-        if 'HTTP_PROXY' in os.environ:
-            del os.environ['HTTP_PROXY']
-        if 'HTTPS_PROXY' in os.environ:
-            del os.environ['HTTPS_PROXY']
 
 async def execute_complimentary_buy_trade(
     poly_client: Optional[ClobClient], kalshi_client: Optional[KalshiHttpClient],
     canonical_name_1: str, canonical_name_2: str,
     book1_platform: str, book1_market_id: str, book1_ask: float, book1_bid: float,
     book2_platform: str, book2_market_id: str, book2_ask: float, book2_bid: float,
-    trade_size: int, proxies: dict
+    trade_size: int, proxies: dict,
+    order_type: OrderType = OrderType.GTC, lookup_polymarket: bool = True, reverse_on_half_fill: bool = False
 ):
     """
     Coordinates the two BUY legs of the complimentary arbitrage trade and handles failures.
+
+    Args:
+        order_type: Order type for the Polymarket BUY leg.
+        lookup_polymarket: Fetch and print the Polymarket order after a successful Polymarket buy.
+        reverse_on_half_fill: If only one leg succeeds, sell it back at its bid.
     """
     logger.info(
         f"--- ATTEMPTING COMPLIMENTARY ARBITRAGE for {canonical_name_1} and {canonical_name_2} ---\n"
@@ -163,6 +168,20 @@ async def execute_complimentary_buy_trade(
         f"  - BUY {trade_size} on {book2_platform} @ {book2_ask:.4f}"
     )
 
+    # platform -> fn(market_id, price, side) returning the coroutine that places a trade_size order.
+    # Buys are order_type on Polymarket / FOK on Kalshi; reversal sells use non-FOK orders (FAK on
+    # Polymarket, an expiring limit on Kalshi) to increase the chance of a fill.
+    # For complimentary markets, we are always buying a "yes" contract on one outcome and a "yes" on the other.
+    # If your market mapping involves 'no' markets on Kalshi, you would need to adjust the is_yes flag based on that.
+    executors = {
+        "Polymarket": lambda market_id, price, side: execute_polymarket_trade(
+            poly_client, market_id, price, trade_size, side, order_type if side == BUY else OrderType.FAK, proxies
+        ),
+        "Kalshi": lambda market_id, price, side: execute_kalshi_trade(
+            kalshi_client, market_id, 'buy' if side == BUY else 'sell', price, trade_size, is_fok=(side == BUY), is_yes=True
+        ),
+    }
+
     tasks = {}
 
     # Define the tasks for the two buy orders
@@ -171,60 +190,64 @@ async def execute_complimentary_buy_trade(
     prices = [book1_ask, book2_ask]
     
     for i, platform in enumerate(platforms):
-        if platform == "Polymarket":
-            tasks[i] = execute_polymarket_trade(poly_client, market_ids[i], prices[i], trade_size, BUY, OrderType.GTC, proxies)
-        elif platform == "Kalshi":
-            #tasks[i]=blank()
-            # For complimentary markets, we are always buying a "yes" contract on one outcome and a "yes" on the other.
-            # If your market mapping involves 'no' markets on Kalshi, you would need to adjust the is_yes flag based on that.
-            tasks[i] = execute_kalshi_trade(kalshi_client, market_ids[i], 'buy', prices[i], trade_size, is_fok=True, is_yes=True)
-
-    # Execute both buy orders concurrently
-    results = await asyncio.gather(*tasks.values())
-    result1 = results[0]
-    result2 = results[1]
-
-
+        execute = executors.get(platform)
+        if execute is not None:
+            tasks[i] = execute(market_ids[i], prices[i], BUY)
 
     def is_trade_successful(platform, result):
-        global poly_id
+        """Returns (succeeded, Polymarket order id or None for other platforms)."""
         if not result:
-            return False
+            return False, None
         if platform == "Polymarket":
-            poly_id=result.get('orderID')
-            return result.get('success') is True
+            return result.get('success') is True, result.get('orderID')
         elif platform == "Kalshi":
             # Successful Kalshi order has an 'order' object and status is not 'CANCELED' or 'FAILED'
-            return "order" in result and result['order'].get('status') not in ['CANCELED', 'FAILED']
-        return False
-    
-    success1 = is_trade_successful(book1_platform, result1)
-    success2 = is_trade_successful(book2_platform, result2)
-
-    await find_polymarket_trade(client=poly_client, order_id=poly_id, proxies=proxies)
-    print(poly_id)
+            return "order" in result and result['order'].get('status') not in ['CANCELED', 'FAILED'], None
+        return False, None
+
+    async def run_leg(i, leg):
+        return i, await leg
+
+    # Execute both buy orders concurrently and judge each leg as soon as it returns, so a
+    # failure is reported without waiting on the slower leg. The other leg is not cancelled:
+    # its order may already be on the exchange and the reversal below needs its result.
+    results = [None, None]
+    successes = [False, False]
+    poly_order_id = None
+    for next_leg in asyncio.as_completed([run_leg(i, leg) for i, leg in tasks.items()]):
+        i, results[i] = await next_leg
+        successes[i], order_id = is_trade_successful(platforms[i], results[i])
+        if successes[i] and order_id:
+            poly_order_id = order_id # Only a Polymarket buy that went through is worth looking up
+        if not successes[i]:
+            logger.warning(f"[{canonical_name_1} / {canonical_name_2}] Buy on {platforms[i]} FAILED.")
+    result1, result2 = results
+    success1, success2 = successes
+
+    # The order lookup is only printed, so it runs in the background instead of delaying a reversal
+    lookup_task = None
+    if lookup_polymarket and poly_order_id:
+        lookup_task = asyncio.create_task(find_polymarket_trade(client=poly_client, order_id=poly_order_id, proxies=proxies))
 
     # --- Reversal Logic ---
     # Important: If one trade succeeds and the other fails, we must reverse the successful trade to avoid exposure.
     if success1 and not success2:
         logger.warning(f"[{canonical_name_1} / {canonical_name_2}] Buy on {book1_platform} SUCCEEDED but buy on {book2_platform} FAILED. Reversing first leg.")
-        if False:
-            if book1_platform == "Polymarket":
-                # Sell the contracts we just bought. Using a non-FOK order to increase chance of fill.
-                await execute_polymarket_trade(poly_client, book1_market_id, book1_bid, trade_size, SELL, OrderType.FAK, proxies)
-            else: # Kalshi
-                await execute_kalshi_trade(kalshi_client, book1_market_id, 'sell', book1_bid, trade_size, is_fok=False, is_yes=True)
+        if reverse_on_half_fill:
+            # Sell the contracts we just bought
+            await executors[book1_platform](book1_market_id, book1_bid, SELL)
 
     elif not success1 and success2:
         logger.warning(f"[{canonical_name_1} / {canonical_name_2}] Buy on {book2_platform} SUCCEEDED but buy on {book1_platform} FAILED. Reversing second leg.")
-        if False:
-            if book2_platform == "Polymarket":
-                await execute_polymarket_trade(poly_client, book2_market_id, book2_bid, trade_size, SELL, OrderType.FAK, proxies)
-            else: # Kalshi
-                await execute_kalshi_trade(kalshi_client, book2_market_id, 'sell', book2_bid, trade_size, is_fok=False, is_yes=True)
+        if reverse_on_half_fill:
+            await executors[book2_platform](book2_market_id, book2_bid, SELL)
                 
     elif success1 and success2:
         logger.info(f"[{canonical_name_1} / {canonical_name_2}] Complimentary arbitrage trade successfully executed on both legs.")
     
     else:
-        logger.error(f"[{canonical_name_1} / {canonical_name_2}] Both legs of the complimentary arbitrage trade failed.")
\ No newline at end of file
+        logger.error(f"[{canonical_name_1} / {canonical_name_2}] Both legs of the complimentary arbitrage trade failed.")
+
+    if lookup_task is not None:
+        await lookup_task
+        print(poly_order_id)
\ No newline at end of file
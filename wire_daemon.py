@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+
+import wire_manager
+from wire_manager import (
+    WIREGUARD_CONFIG_DIR, WIREGUARD_CONFIG_NAME, INTERFACE_NAME_WINDOWS,
+    connect_wireguard_windows_async, disconnect_wireguard_windows_async, check_external_ip,
+)
+
+# Long-running holder of the WireGuard tunnel. Clients send one JSON command per line and get one
+# JSON reply per line back, so bringing the tunnel up is paid once instead of per script run:
+#   {"cmd": "ensure_up"}                      -> {"ok": true, "ip": "1.2.3.4"}
+#   {"cmd": "status"}                         -> {"ok": true, "up": true, "config": "...", "ip": "..."}
+#   {"cmd": "reconnect"}                      -> re-applies the current config
+#   {"cmd": "switch_exit", "config": "name"}  -> applies <WIREGUARD_CONFIG_DIR>/<name>.conf
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 48712
+
+
+class WireDaemon:
+    def __init__(self, config_path, interface_name):
+        self.config_path = config_path
+        self.interface_name = interface_name
+        self.up = False
+        # Set by the first successful connect; from then on the interface may hold a peer config,
+        # so serve() clears it on shutdown
+        self.connected_once = False
+        self.lock = asyncio.Lock() # One setconf at a time
+
+    async def _connect(self, config_path):
+        # A failed setconf leaves the previous peer config (and self.up) as they were
+        ok = await connect_wireguard_windows_async(config_path, self.interface_name)
+        if ok:
+            self.up = self.connected_once = True
+            self.config_path = config_path
+        return ok
+
+    async def ensure_up(self):
+        async with self.lock:
+            if not self.up and not await self._connect(self.config_path):
+                return {"ok": False, "error": "connect failed"}
+        return {"ok": True, "ip": await asyncio.to_thread(check_external_ip)}
+
+    async def status(self):
+        ip_address = await asyncio.to_thread(check_external_ip) if self.up else None
+        return {"ok": True, "up": self.up, "config": os.path.basename(self.config_path), "ip": ip_address}
+
+    async def reconnect(self):
+        async with self.lock:
+            ok = await self._connect(self.config_path)
+        return {"ok": ok}
+
+    async def switch_exit(self, config_name):
+        config_path = os.path.join(WIREGUARD_CONFIG_DIR, f"{config_name}.conf")
+        if not os.path.exists(config_path):
+            return {"ok": False, "error": f"config not found: {config_path}"}
+        async with self.lock:
+            ok = await self._connect(config_path)
+        return {"ok": ok, "config": config_name}
+
+    async def handle_command(self, command):
+        cmd = command.get("cmd")
+        if cmd == "ensure_up":
+            return await self.ensure_up()
+        elif cmd == "status":
+            return await self.status()
+        elif cmd == "reconnect":
+            return await self.reconnect()
+        elif cmd == "switch_exit":
+            return await self.switch_exit(command.get("config", ""))
+        return {"ok": False, "error": f"unknown cmd: {cmd}"}
+
+    async def handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = await self.handle_command(json.loads(line))
+                except (ValueError, AttributeError) as e: # Not JSON, or not a JSON object
+                    reply = {"ok": False, "error": f"bad request: {e}"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DAEMON_HOST, port=DAEMON_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"[INFO] WireGuard daemon listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.connected_once:
+                await disconnect_wireguard_windows_async(self.interface_name)
+
+
+def request(cmd, timeout=30, **kwargs):
+    """Sends one command to a running daemon and returns its reply (blocking, for scripts like try_buy.py)."""
+    with socket.create_connection((DAEMON_HOST, DAEMON_PORT), timeout=timeout) as sock:
+        sock.sendall(json.dumps({"cmd": cmd, **kwargs}).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    config_filepath = os.path.join(WIREGUARD_CONFIG_DIR, f"{WIREGUARD_CONFIG_NAME}.conf")
+    if not os.path.exists(config_filepath):
+        print(f"[CRITICAL ERROR] WireGuard config file not found: {config_filepath}")
+        sys.exit(1)
+    if wire_manager.PICK_FASTEST_CONFIG:
+        config_filepath = wire_manager.pick_fastest_config(WIREGUARD_CONFIG_DIR) or config_filepath
+
+    try:
+        asyncio.run(WireDaemon(config_filepath, INTERFACE_NAME_WINDOWS).serve())
+    except KeyboardInterrupt:
+        print("[INFO] WireGuard daemon stopped.")
@@ -1,9 +1,25 @@
+import asyncio
+import atexit
+import base64
+import functools
+import json
 import subprocess
 import time
 import os
 import re
+import shutil
 import requests
+import socket
 import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import aiohttp
+except ImportError: # main_async falls back to the requests-based checks in worker threads
+    aiohttp = None
 # --- Configuration ---
 # Directory where your WireGuard .conf files are stored
 # IMPORTANT: Replace with the actual path to your WireGuard configs
@@ -21,91 +37,520 @@ WIREGUARD_CONFIG_NAME = "wg-CA-85" # Example: A free server in Germany
 
 INTERFACE_NAME_WINDOWS = "wg-CA-85" # Must match exactly!
 
+# If True, connect with whichever .conf in WIREGUARD_CONFIG_DIR has the lowest-latency endpoint
+# instead of WIREGUARD_CONFIG_NAME
+PICK_FASTEST_CONFIG = False
+# Endpoints can't be probed over their WireGuard UDP port, so RTT is measured with TCP connects
+# to this port, which Proton's servers keep open
+RTT_PROBE_PORT = 443
+
 # Path to the wg.exe executable. Usually it's added to PATH, but if not:
 # WIREGUARD_EXE_PATH = "C:\\Program Files\\WireGuard\\wg.exe"
 # If wg.exe is in your PATH, you can just use "wg"
 WIREGUARD_EXE_PATH = "C:\Program Files\WireGuard\wg.exe" # Assuming 'wg.exe' is in your system's PATH
+# Keeps each wg.exe spawn from flashing a console window on Windows
+_WG_CREATIONFLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+# Absolute wg.exe path, looked up once so each setconf doesn't make Windows search PATH/PATHEXT again
+_WG_EXE = shutil.which(WIREGUARD_EXE_PATH) or shutil.which("wg.exe") or WIREGUARD_EXE_PATH
+
+# Echoes the caller's external IP as plain text
+_IP_CHECK_URL = "http://icanhazip.com/"
+# One pooled session for every IP check, so repeat checks reuse a keep-alive connection
+# instead of paying a new TCP (and TLS) handshake each time
+_SESSION = requests.Session()
+# Its pooled sockets are dropped whenever the tunnel goes up or down (see _bump_connection_epoch),
+# since a socket opened over the old route would keep reporting the old IP
+_ADAPTER = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.2))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+atexit.register(_SESSION.close)
+
+# Bumped whenever the tunnel is brought up or torn down; check_external_ip() results are
+# cached per epoch, since the external IP only changes across those transitions
+_connection_epoch = 0
+# (epoch, aiohttp.ClientSession) for the async IP checks; replaced on the first check of a new epoch
+_aio_session = None
+
+# Endpoint hostname -> (IPv4 address, resolved at time.monotonic()), reused for DNS_CACHE_TTL_SECONDS
+_DNS_CACHE = {}
+DNS_CACHE_TTL_SECONDS = 300
+# Config path -> (mtime_ns, file text); the file is only read again after it has been modified
+_CONF_TEXT = {}
+# Last IP seen outside the tunnel, persisted across runs so a fresh one skips the initial IP check
+IP_CACHE_PATH = os.path.join(os.getenv("LOCALAPPDATA") or tempfile.gettempdir(), "arbitrage-bot", "last_ip.json")
+IP_CACHE_TTL_SECONDS = 600
+# Private (0o700) directory for the short-lived config copies handed to wg.exe, created on first use
+_private_conf_dir = None
+# Matches a config's "Endpoint = host:port" line; group 1 is the host, group 2 the port
+_ENDPOINT_RE = re.compile(r"(?m)^\s*Endpoint\s*=\s*([^:\s]+):(\d+)")
+
+# The WireGuard Windows service exposes each tunnel's UAPI socket (the protocol wg.exe itself speaks)
+# as a named pipe under this prefix; writing the config there skips spawning wg.exe
+_UAPI_PIPE_PREFIX = "\\\\.\\pipe\\ProtectedPrefix\\Administrators\\WireGuard\\"
+# .conf key -> UAPI key; keys are converted from base64 to hex. wg-quick-only keys (Address, DNS, ...) have no entry.
+_UAPI_KEYS = {
+    "privatekey": "private_key", "listenport": "listen_port", "fwmark": "fwmark",
+    "publickey": "public_key", "presharedkey": "preshared_key", "endpoint": "endpoint",
+    "persistentkeepalive": "persistent_keepalive_interval", "allowedips": "allowed_ip",
+}
+_UAPI_BASE64_KEYS = {"private_key", "public_key", "preshared_key"}
+# Empty file handed to "wg setconf" to disconnect, resolved once for the platform
+_EMPTY_CONFIG = 'NUL' if sys.platform == "win32" else '/dev/null'
+# Equivalent of "wg setconf <iface> NUL": drops every peer
+_UAPI_CLEAR_PEERS = b"set=1\nreplace_peers=true\n\n"
 
 # --- Functions ---
 
-def connect_wireguard_windows(config_path, interface_name):
+def _read_conf(config_path):
+    """Returns the text of a WireGuard config, re-reading the file only when its mtime has changed."""
+    mtime_ns = os.stat(config_path).st_mtime_ns
+    cached = _CONF_TEXT.get(config_path)
+    if cached is None or cached[0] != mtime_ns:
+        with open(config_path) as f:
+            cached = _CONF_TEXT[config_path] = (mtime_ns, f.read())
+    return cached[1]
+
+def _lookup_host(host):
+    """Returns host's IPv4 address, from _DNS_CACHE while the entry is fresh."""
+    cached = _DNS_CACHE.get(host)
+    if cached and time.monotonic() - cached[1] < DNS_CACHE_TTL_SECONDS:
+        return cached[0]
+    ip_address = socket.getaddrinfo(host, None, socket.AF_INET)[0][4][0]
+    _DNS_CACHE[host] = (ip_address, time.monotonic())
+    return ip_address
+
+def _measure_rtt(config_path, attempts=3):
+    """Best of `attempts` TCP connect times (seconds) to a config's endpoint, or inf if it can't be reached."""
+    try:
+        match = _ENDPOINT_RE.search(_read_conf(config_path))
+        if not match:
+            return float("inf")
+        ip_address = _lookup_host(match.group(1))
+    except (OSError, IndexError):
+        return float("inf")
+    best = float("inf")
+    for _ in range(attempts):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((ip_address, RTT_PROBE_PORT), timeout=1):
+                best = min(best, time.perf_counter() - start)
+        except OSError:
+            pass
+    return best
+
+def pick_fastest_config(config_dir):
     """
-    Connects to WireGuard on Windows by applying the config using wg.exe setconf.
-    Requires an existing WireGuard interface with the given name.
+    Probes the endpoint of every .conf in config_dir concurrently and returns the path of the one
+    with the lowest RTT, or None if none of them could be reached.
     """
-    print(f"[INFO] Attempting to connect to WireGuard interface '{interface_name}' using '{config_path}'...")
+    confs = [os.path.join(config_dir, name) for name in os.listdir(config_dir) if name.endswith(".conf")]
+    if not confs:
+        return None
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        rtts = list(ex.map(lambda c: (c, _measure_rtt(c)), confs))
+    fastest, rtt = min(rtts, key=lambda t: t[1])
+    if rtt == float("inf"):
+        return None
+    print(f"[INFO] Fastest WireGuard endpoint: {os.path.basename(fastest)} ({rtt * 1000:.1f} ms)")
+    return fastest
+
+def _resolve_endpoint(config_path):
+    """
+    Returns the text of the WireGuard config with the Endpoint hostname replaced by its (cached)
+    IPv4 address, so the tunnel doesn't resolve it on every setconf. Falls back to the text as is
+    if there is no Endpoint line or the lookup fails. Raises OSError if the config can't be read.
+    """
+    conf_text = _read_conf(config_path)
+    match = _ENDPOINT_RE.search(conf_text)
+    if not match:
+        return conf_text
     try:
-        # On Windows, this operation often requires Administrator privileges.
-        # Ensure your Python script is run as Administrator.
-        
-        # Command to apply the configuration file
-        command = [WIREGUARD_EXE_PATH, 'setconf', interface_name, config_path]
-        
-        # Using subprocess.run for simplicity, capturing output
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        print(f"[SUCCESS] WireGuard interface '{interface_name}' configured and active.")
-        print("wg.exe output:\n", result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Failed to setconf WireGuard interface '{interface_name}':")
-        print(f"  Return Code: {e.returncode}")
-        print(f"  Stdout: {e.stdout}")
-        print(f"  Stderr: {e.stderr}")
-        print("This often means the interface name is wrong, the config file has issues, or you need Administrator privileges.")
+        ip_address = _lookup_host(match.group(1))
+    except (OSError, IndexError) as e: # socket.gaierror is an OSError
+        print(f"[WARNING] Could not pre-resolve the WireGuard endpoint, using {config_path} as is: {e}")
+        return conf_text
+    return conf_text[:match.start(1)] + ip_address + conf_text[match.end(1):]
+
+def _write_private_conf(conf_text):
+    """
+    Writes conf_text (which holds the PrivateKey) to a new file readable only by the current user,
+    inside a private temp directory, and returns its path. Callers delete it with _remove_private_conf().
+    """
+    global _private_conf_dir
+    if _private_conf_dir is None:
+        _private_conf_dir = tempfile.mkdtemp(prefix="arbitrage-bot-wg-") # Created 0o700
+        atexit.register(shutil.rmtree, _private_conf_dir, ignore_errors=True)
+    fd, path = tempfile.mkstemp(suffix=".conf", dir=_private_conf_dir) # Created 0o600
+    with os.fdopen(fd, "w") as f:
+        f.write(conf_text)
+    return path
+
+def _remove_private_conf(command):
+    """Deletes the config copy a wg.exe setconf command used, if _write_private_conf() made it."""
+    if command and _private_conf_dir and os.path.dirname(command[-1]) == _private_conf_dir:
+        try:
+            os.remove(command[-1])
+        except OSError:
+            pass
+
+def _conf_to_uapi(conf_text):
+    """Translates a WireGuard .conf into a UAPI "set" request that replaces the interface's peers."""
+    lines = ["set=1", "replace_peers=true"]
+    for raw_line in conf_text.splitlines():
+        line = raw_line.split("#", 1)[0].strip()
+        if not line or line.startswith("["):
+            continue
+        key, _, value = line.partition("=")
+        uapi_key = _UAPI_KEYS.get(key.strip().lower())
+        if uapi_key is None:
+            continue
+        value = value.strip()
+        if uapi_key in _UAPI_BASE64_KEYS:
+            value = base64.b64decode(value).hex()
+        if uapi_key == "allowed_ip":
+            lines.extend(f"allowed_ip={ip.strip()}" for ip in value.split(",") if ip.strip())
+        else:
+            lines.append(f"{uapi_key}={value}")
+        if uapi_key == "public_key":
+            lines.append("replace_allowed_ips=true") # Must directly follow the peer's public_key
+    return ("\n".join(lines) + "\n\n").encode()
+
+def _pipe_setconf(interface_name, uapi_request):
+    """
+    Sends a UAPI set request straight to the tunnel's named pipe. Returns True if the service
+    applied it, False if the pipe isn't available (not Windows, no such tunnel, no access) or
+    the service reported an error, in which case callers fall back to wg.exe.
+    """
+    if sys.platform != "win32":
         return False
-    except FileNotFoundError:
-        print(f"[ERROR] '{WIREGUARD_EXE_PATH}' command not found. Is WireGuard installed and in your PATH?")
-        print("If not in PATH, set WIREGUARD_EXE_PATH to the full path, e.g., 'C:\\Program Files\\WireGuard\\wg.exe'")
+    try:
+        with open(_UAPI_PIPE_PREFIX + interface_name, "r+b", buffering=0) as pipe:
+            pipe.write(uapi_request)
+            response = b""
+            while not response.endswith(b"\n\n"):
+                chunk = pipe.read(4096)
+                if not chunk:
+                    break
+                response += chunk
+    except OSError as e:
+        print(f"[INFO] WireGuard UAPI pipe unavailable, falling back to wg.exe: {e}")
         return False
-    except Exception as e:
-        print(f"[ERROR] An unexpected error occurred during connection: {e}")
+    if b"errno=0\n" not in response:
+        print(f"[WARNING] WireGuard UAPI set failed ({response.decode(errors='replace').strip()}), falling back to wg.exe")
         return False
+    return True
 
-def disconnect_wireguard_windows(interface_name):
+def _pipe_setconf_text(interface_name, conf_text):
+    """_pipe_setconf() for the text of a .conf file."""
+    try:
+        uapi_request = _conf_to_uapi(conf_text)
+    except ValueError: # A key in the config wasn't valid base64
+        return False
+    return _pipe_setconf(interface_name, uapi_request)
+
+def _setconf_start(interface_name, config_path=None):
     """
-    Disconnects the specified WireGuard interface on Windows by setting an empty config.
+    First half of connect (config_path given) and disconnect (config_path None), shared by the
+    sync and async versions: prints the attempt and applies the config over the UAPI pipe if
+    it can. Returns None if that worked, else the wg.exe setconf command to run instead.
     """
-    print(f"[INFO] Attempting to disconnect WireGuard interface '{interface_name}'...")
-    try:
+    if config_path is None:
+        print(f"[INFO] Attempting to disconnect WireGuard interface '{interface_name}'...")
         # To disconnect, we apply an empty configuration to the interface.
         # This effectively clears its keys and routes, stopping the tunnel.
-        command = [WIREGUARD_EXE_PATH, 'setconf', interface_name, '/dev/null'] # Linux/macOS equivalent for empty file
-        if sys.platform == "win32":
-            # On Windows, use "NUL" as the empty file equivalent
-            command = [WIREGUARD_EXE_PATH, 'setconf', interface_name, 'NUL']
-            
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        print(f"[SUCCESS] WireGuard interface '{interface_name}' disconnected.")
-        print("wg.exe output:\n", result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Failed to disconnect WireGuard interface '{interface_name}': {e}")
-        print("wg.exe stdout:\n", e.stdout)
-        print("wg.exe stderr:\n", e.stderr)
-        return False
-    except FileNotFoundError:
-        print(f"[ERROR] '{WIREGUARD_EXE_PATH}' command not found. Is WireGuard installed and in your PATH?")
-        return False
+        if _pipe_setconf(interface_name, _UAPI_CLEAR_PEERS):
+            return None
+        return [_WG_EXE, 'setconf', interface_name, _EMPTY_CONFIG]
+
+    print(f"[INFO] Attempting to connect to WireGuard interface '{interface_name}' using '{config_path}'...")
+    # On Windows, this operation often requires Administrator privileges.
+    # Ensure your Python script is run as Administrator.
+    # The resolved text only ever reaches disk as a private copy for wg.exe, deleted once setconf is done
+    conf_text = _resolve_endpoint(config_path)
+    if _pipe_setconf_text(interface_name, conf_text):
+        return None
+    if conf_text == _read_conf(config_path): # Nothing was resolved, so wg.exe can read the original
+        return [_WG_EXE, 'setconf', interface_name, config_path]
+    return [_WG_EXE, 'setconf', interface_name, _write_private_conf(conf_text)]
+
+def _setconf_finish(interface_name, connecting, result, warm_ip_check=True):
+    """
+    Second half of connect/disconnect: reports the outcome and does the post-change bookkeeping.
+    result is None if the UAPI pipe applied the config, else wg.exe's (returncode, stdout, stderr).
+    warm_ip_check is passed on to _on_connected(). Returns whether the change took effect.
+    """
+    via = " via the UAPI pipe" if result is None else ""
+    if result is not None:
+        returncode, stdout, stderr = result
+        if returncode != 0:
+            if connecting:
+                print(f"[ERROR] Failed to setconf WireGuard interface '{interface_name}':")
+                print(f"  Return Code: {returncode}")
+                print(f"  Stdout: {_output_text(stdout)}")
+                print(f"  Stderr: {_output_text(stderr)}")
+                print("This often means the interface name is wrong, the config file has issues, or you need Administrator privileges.")
+            else:
+                print(f"[ERROR] Failed to disconnect WireGuard interface '{interface_name}': return code {returncode}")
+                print("wg.exe stdout:\n", _output_text(stdout))
+                print("wg.exe stderr:\n", _output_text(stderr))
+            return False
+
+    if connecting:
+        _on_connected(warm_ip_check)
+        print(f"[SUCCESS] WireGuard interface '{interface_name}' configured{via} and active.")
+    else:
+        _bump_connection_epoch()
+        print(f"[SUCCESS] WireGuard interface '{interface_name}' disconnected{via}.")
+    if result is not None and result[1]: # setconf normally prints nothing, so usually nothing to decode
+        print("wg.exe output:\n", _output_text(result[1]))
+    return True
+
+def _setconf_error(connecting, error):
+    """Reports an exception raised while connecting/disconnecting; always returns False."""
+    if isinstance(error, FileNotFoundError):
+        print(f"[ERROR] '{_WG_EXE}' command not found. Is WireGuard installed and in your PATH?")
+        if connecting:
+            print("If not in PATH, set WIREGUARD_EXE_PATH to the full path, e.g., 'C:\\Program Files\\WireGuard\\wg.exe'")
+    else:
+        print(f"[ERROR] An unexpected error occurred during {'connection' if connecting else 'disconnection'}: {error}")
+    return False
+
+def _run_wg(command):
+    """Runs a wg.exe command; returns (returncode, stdout, stderr) with the output as bytes."""
+    result = subprocess.run(command, capture_output=True, creationflags=_WG_CREATIONFLAGS)
+    return result.returncode, result.stdout, result.stderr
+
+async def _run_wg_async(command, timeout=30):
+    """
+    Runs a wg.exe command without blocking the event loop.
+    Returns (returncode, stdout, stderr) with the output as bytes.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, creationflags=_WG_CREATIONFLAGS
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return proc.returncode, stdout, stderr
+
+def _setconf(interface_name, config_path=None):
+    connecting = config_path is not None
+    command = None
+    try:
+        command = _setconf_start(interface_name, config_path)
+        result = _run_wg(command) if command else None
     except Exception as e:
-        print(f"[ERROR] An unexpected error occurred during disconnection: {e}")
-        return False
+        return _setconf_error(connecting, e)
+    finally:
+        _remove_private_conf(command)
+    return _setconf_finish(interface_name, connecting, result)
+
+async def _setconf_async(interface_name, config_path=None, warm_ip_check=True):
+    connecting = config_path is not None
+    command = None
+    try:
+        command = await asyncio.to_thread(_setconf_start, interface_name, config_path)
+        result = await _run_wg_async(command) if command else None
+    except Exception as e:
+        return _setconf_error(connecting, e)
+    finally:
+        _remove_private_conf(command)
+    return _setconf_finish(interface_name, connecting, result, warm_ip_check)
+
+def connect_wireguard_windows(config_path, interface_name):
+    """
+    Connects to WireGuard on Windows by applying the config over the service's UAPI pipe,
+    or with wg.exe setconf if that isn't available.
+    Requires an existing WireGuard interface with the given name.
+    """
+    return _setconf(interface_name, config_path)
+
+def disconnect_wireguard_windows(interface_name):
+    """
+    Disconnects the specified WireGuard interface on Windows by setting an empty config.
+    """
+    return _setconf(interface_name)
+
+async def connect_wireguard_windows_async(config_path, interface_name, warm_ip_check=True):
+    """
+    Async connect_wireguard_windows(): wg.exe runs via asyncio.create_subprocess_exec.
+    Pass warm_ip_check=False if the caller's IP checks won't go through check_external_ip()
+    (e.g. they use check_external_ip_async()), so nothing opens a connection they won't reuse.
+    """
+    return await _setconf_async(interface_name, config_path, warm_ip_check)
+
+async def disconnect_wireguard_windows_async(interface_name):
+    """Async disconnect_wireguard_windows()."""
+    return await _setconf_async(interface_name)
+
+def _warm_ip_check_connection():
+    """Opens a pooled connection to the IP check host over the new route (the result is ignored)."""
+    try:
+        _SESSION.head(_IP_CHECK_URL, timeout=3)
+    except requests.exceptions.RequestException:
+        pass
+
+def _output_text(raw):
+    """Decodes wg.exe output (bytes) for printing; only needed on the paths that actually print it."""
+    return raw.decode("utf-8", "replace")
+
+def _on_connected(warm_ip_check=True):
+    """Bookkeeping after the tunnel comes up, whichever way it was configured."""
+    _bump_connection_epoch()
+    if not warm_ip_check:
+        return
+    # Open the post-VPN connection in the background while the caller moves on,
+    # so the next check_external_ip() finds it already in the pool
+    threading.Thread(target=_warm_ip_check_connection, daemon=True).start()
+
+def _bump_connection_epoch():
+    global _connection_epoch
+    _connection_epoch += 1
+    # Keep-alive sockets from before the route change would still exit through the old route
+    _ADAPTER.close()
+
+async def _epoch_session():
+    """
+    The aiohttp session for the current connection epoch. The first call in a new epoch closes
+    the previous session, and with it the connector's pre-route-change keep-alive sockets.
+    """
+    global _aio_session
+    if _aio_session is not None:
+        epoch, session = _aio_session
+        if epoch == _connection_epoch:
+            return session
+        await session.close()
+    connector = aiohttp.TCPConnector(limit=4, ttl_dns_cache=300, use_dns_cache=True, keepalive_timeout=60)
+    session = aiohttp.ClientSession(connector=connector)
+    _aio_session = (_connection_epoch, session)
+    return session
+
+async def _close_epoch_session():
+    global _aio_session
+    if _aio_session is not None:
+        await _aio_session[1].close()
+        _aio_session = None
 
 def check_external_ip():
     """
     Checks the current external IP address to verify VPN connection.
+    Repeat calls between tunnel state changes reuse the last successful result.
     """
+    ip_address = _check_ip(_connection_epoch)
+    if ip_address is None:
+        _check_ip.cache_clear() # Only successful lookups are remembered
+    return ip_address
+
+@functools.lru_cache(maxsize=4)
+def _check_ip(epoch):
+    """Looks up the external IP; the epoch argument only keys the cache."""
     print("[INFO] Checking external IP address...")
+    return _report_ip(*_fetch_ip(timeout=5))
+
+def _fetch_ip(timeout):
+    """One GET of _IP_CHECK_URL; returns (ip, None), or (None, error) if the request failed."""
     try:
-        response = requests.get("http://icanhazip.com/", timeout=5)
+        response = _SESSION.get(_IP_CHECK_URL, timeout=timeout)
         response.raise_for_status()
-        ip_address = response.text.strip()
-        print(f"Your current external IP: {ip_address}")
-        return ip_address
+        return response.text.strip(), None
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] Could not check external IP: {e}")
+        return None, e
+
+async def _fetch_ip_async(timeout):
+    """aiohttp version of _fetch_ip()."""
+    session = await _epoch_session()
+    try:
+        async with session.get(_IP_CHECK_URL, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            return (await response.text()).strip(), None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return None, e
+
+def _report_ip(ip_address, error):
+    """Prints the outcome of an external IP check and returns the IP (None on failure)."""
+    if error is not None:
+        print(f"[ERROR] Could not check external IP: {error}")
         return None
+    print(f"Your current external IP: {ip_address}")
+    return ip_address
+
+def _load_cached_ip():
+    """Returns (ip, age in seconds) from IP_CACHE_PATH, or (None, None) if there is no usable entry."""
+    try:
+        with open(IP_CACHE_PATH) as f:
+            cached = json.load(f)
+        return cached["ip"], time.time() - cached["ts"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+def _save_cached_ip(ip_address):
+    """Records ip_address (seen outside the tunnel) in IP_CACHE_PATH."""
+    try:
+        os.makedirs(os.path.dirname(IP_CACHE_PATH), exist_ok=True)
+        with open(IP_CACHE_PATH, "w") as f:
+            json.dump({"ip": ip_address, "ts": time.time()}, f)
+    except OSError as e:
+        print(f"[WARNING] Could not save the external IP cache: {e}")
+
+def _vpn_ready_polls(initial_ip, deadline):
+    """
+    The polling schedule behind wait_for_vpn_ready() and its async version, as a generator: it
+    yields how long to sleep before the next IP check, is sent that check's _fetch_ip() result,
+    and returns (via StopIteration) the IP to report once the IP changes or time runs out.
+    """
+    print("[INFO] Waiting for the VPN route to come up...")
+    give_up_at = time.monotonic() + deadline
+    delay = 0.25
+    ip_address = None
+    while True:
+        fetched_ip, error = yield delay
+        if error is not None:
+            print(f"[INFO] IP check failed while waiting for VPN: {error}")
+        else:
+            ip_address = fetched_ip
+        if ip_address and ip_address != initial_ip:
+            print(f"Your current external IP: {ip_address}")
+            return ip_address
+        if time.monotonic() + delay >= give_up_at:
+            return ip_address
+        delay = min(delay * 2, 2.0)
+
+def wait_for_vpn_ready(initial_ip, deadline=20.0):
+    """
+    Polls the external IP with exponential backoff (0.25s doubling up to 2s) until it differs
+    from initial_ip or deadline seconds have passed. Returns the first differing IP, or the
+    last IP seen (possibly None) if it never changed.
+    """
+    polls = _vpn_ready_polls(initial_ip, deadline)
+    delay = next(polls)
+    while True:
+        time.sleep(delay)
+        try:
+            delay = polls.send(_fetch_ip(timeout=2))
+        except StopIteration as done:
+            return done.value
+
+async def check_external_ip_async():
+    """
+    aiohttp version of check_external_ip() for main_async: the lookup doesn't tie up a worker
+    thread, and the session's connector caches the icanhazip.com DNS answer across calls.
+    """
+    print("[INFO] Checking external IP address...")
+    return _report_ip(*await _fetch_ip_async(timeout=5))
+
+async def wait_for_vpn_ready_async(initial_ip, deadline=20.0):
+    """aiohttp version of wait_for_vpn_ready(), with the same backoff schedule."""
+    polls = _vpn_ready_polls(initial_ip, deadline)
+    delay = next(polls)
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            delay = polls.send(await _fetch_ip_async(timeout=2))
+        except StopIteration as done:
+            return done.value
 
 def set_proxy_environment_variables(proxy_type, ip, port):
     """
@@ -131,29 +576,61 @@ def clear_proxy_environment_variables():
             del os.environ[var]
     print("[INFO] Proxy environment variables cleared.")
 
-# --- Main Execution ---
-if __name__ == "__main__":
+async def main_async(config_filepath):
+    """Connects, verifies the IP change, and disconnects, overlapping the steps that are independent."""
     try:
-        import requests
-    except ImportError:
-        print("The 'requests' library is not installed. Please install it: pip install requests")
-        sys.exit(1)
+        await _run_main_async(config_filepath)
+    finally:
+        await _close_epoch_session()
 
-    config_filepath = os.path.join(WIREGUARD_CONFIG_DIR, f"{WIREGUARD_CONFIG_NAME}.conf")
+async def _run_main_async(config_filepath):
+    """main_async body; IP checks go through aiohttp if it is installed, else requests in a thread."""
+    if aiohttp is not None:
+        check_ip = check_external_ip_async
+        wait_ready = wait_for_vpn_ready_async
+    else:
+        check_ip = lambda: asyncio.to_thread(check_external_ip)
+        wait_ready = lambda initial_ip: asyncio.to_thread(wait_for_vpn_ready, initial_ip)
+
+    async def check_outside_ip():
+        """The pre-VPN IP, from the disk cache if it is fresh, else looked up and cached."""
+        cached_ip, age = _load_cached_ip()
+        if cached_ip and age < IP_CACHE_TTL_SECONDS:
+            print(f"Your current external IP: {cached_ip} (cached {age:.0f}s ago)")
+            return cached_ip
+        ip_address = await check_ip()
+        if ip_address:
+            _save_cached_ip(ip_address)
+        return ip_address
+
+    def check_config():
+        """Whether the config exists; if so its endpoint is also resolved into _DNS_CACHE, so the connect doesn't wait on DNS."""
+        if not os.path.exists(config_filepath):
+            return False
+        _resolve_endpoint(config_filepath)
+        return True
 
-    if not os.path.exists(config_filepath):
+    print("\n--- Initial IP Check (without VPN) ---")
+    # Pre-flight checks are independent I/O, so the file checks hide behind the IP check's round-trip
+    initial_ip, config_ok, wg_exe_found = await asyncio.gather(
+        check_outside_ip(),
+        asyncio.to_thread(check_config),
+        asyncio.to_thread(os.path.isfile, _WG_EXE),
+    )
+    if not config_ok:
         print(f"[CRITICAL ERROR] WireGuard config file not found: {config_filepath}")
         print("Please ensure you have downloaded your Proton VPN WireGuard config and set WIREGUARD_CONFIG_DIR and WIREGUARD_CONFIG_NAME correctly.")
         sys.exit(1)
-
-    print("\n--- Initial IP Check (without VPN) ---")
-    initial_ip = check_external_ip()
+    if not wg_exe_found:
+        # Not fatal: the UAPI pipe can still configure the tunnel without wg.exe
+        print(f"[WARNING] '{_WG_EXE}' not found; only the WireGuard UAPI pipe can be used.")
 
     print(f"\n--- Attempting to connect WireGuard: {WIREGUARD_CONFIG_NAME} ---")
     # Call the Windows-specific connection function
-    if connect_wireguard_windows(config_filepath, INTERFACE_NAME_WINDOWS):
+    # Only the requests-based checks would reuse the warm-up connection
+    if await connect_wireguard_windows_async(config_filepath, INTERFACE_NAME_WINDOWS, warm_ip_check=aiohttp is None):
         print("\n--- IP Check after VPN Connection ---")
-        vpn_ip = check_external_ip()
+        vpn_ip = await wait_ready(initial_ip)
 
         if vpn_ip and vpn_ip != initial_ip:
             print("[VERIFICATION] IP address has changed, VPN appears to be working.")
@@ -167,17 +644,36 @@ if __name__ == "__main__":
         # Example: set_proxy_environment_variables("socks5", "127.0.0.1", "9050")
         
         print("\n[INFO] VPN is active. You can now perform your network operations.")
-        print("Pausing for 20 seconds to simulate work...")
-        time.sleep(20) # Simulate your program doing work while VPN is active
 
         # clear_proxy_environment_variables() # Uncomment if you set them
         
         print("\n--- Disconnecting WireGuard ---")
         # Call the Windows-specific disconnection function
-        disconnect_wireguard_windows(INTERFACE_NAME_WINDOWS)
+        disconnected = await disconnect_wireguard_windows_async(INTERFACE_NAME_WINDOWS)
         
         print("\n--- Final IP Check (after VPN disconnected) ---")
-        check_external_ip()
+        if disconnected:
+            final_ip = await check_ip()
+            if final_ip:
+                _save_cached_ip(final_ip) # Outside the tunnel again, so this refreshes the cache
+        else:
+            await check_ip()
     else:
         print("\n[FATAL] Could not establish WireGuard connection. Exiting.")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    try:
+        import requests
+    except ImportError:
+        print("The 'requests' library is not installed. Please install it: pip install requests")
+        sys.exit(1)
+
+    config_filepath = os.path.join(WIREGUARD_CONFIG_DIR, f"{WIREGUARD_CONFIG_NAME}.conf")
+    # main_async checks that the config exists, concurrently with the initial IP check
+
+    if PICK_FASTEST_CONFIG:
+        config_filepath = pick_fastest_config(WIREGUARD_CONFIG_DIR) or config_filepath
+
+    asyncio.run(main_async(config_filepath))
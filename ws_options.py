@@ -0,0 +1,8 @@
+# Connection options shared by the Polymarket (polymarket.wss) and Kalshi (kalshi.clients) market
+# feeds. Kept in its own module so neither client imports the other (or its logging setup).
+
+# Everything but ping_timeout is websockets' default, spelled out so the bound is visible: the
+# receive buffer holds at most max_queue frames of up to max_size bytes per connection, and bursts
+# beyond that wait in the downstream message queue (test_compare.MESSAGE_QUEUE_MAXSIZE).
+# ping_timeout=10 (default 20) notices a dead feed socket 10s sooner.
+WS_CONNECT_OPTIONS = dict(compression="deflate", ping_interval=20, ping_timeout=10, max_queue=16, max_size=2**20)